@@ -4,7 +4,7 @@ import logging
 from dataclasses import dataclass
 from pathlib import Path
 
-from app.bb.courses import Course, eval_courses_on_portal_page
+from app.bb.courses import Course, eval_courses_on_portal_page, goto_portal
 
 logger = logging.getLogger(__name__)
 
@@ -147,7 +147,7 @@ def extract_new_attempt_url(*, html: str, base_url: str) -> str:
 
 def parse_assignments_html(
     *,
-    html: str,
+    html: str | bytes,
     page_url: str = "",
     base_url: str = "",
     course_id: str = "",
@@ -158,6 +158,10 @@ def parse_assignments_html(
     from html.parser import HTMLParser
     from urllib.parse import urljoin
 
+    if isinstance(html, bytes):
+        # Saved pages are UTF-8; accepting bytes spares callers a text-mode read.
+        html = html.decode("utf-8")
+
     class _Text(HTMLParser):
         def __init__(self) -> None:
             super().__init__()
@@ -280,9 +284,7 @@ async def debug_dump_assignments(
         context = await browser.new_context(storage_state=str(state_path))
         page = await context.new_page()
         try:
-            await page.goto(portal_url, wait_until="domcontentloaded", timeout=timeout_ms)
-            portal_html_path.write_text(await page.content(), encoding="utf-8")
-            logger.info("saved debug portal html: %s", portal_html_path)
+            await goto_portal(page=page, portal_url=portal_url, portal_html_path=portal_html_path, timeout_ms=timeout_ms)
 
             courses = await eval_courses_on_portal_page(page=page)
             matched = [c for c in courses if course_query in c.name]
@@ -366,6 +368,7 @@ async def debug_dump_assignment_samples(
     submitted_assignment_query: str,
     unsubmitted_assignment_query: str,
     headless: bool,
+    portal_html_path: Path,
     assignments_html_path: Path,
     submitted_html_path: Path,
     submitted_new_attempt_html_path: Path,
@@ -388,6 +391,7 @@ async def debug_dump_assignment_samples(
 
     from playwright.async_api import async_playwright
 
+    portal_html_path.parent.mkdir(parents=True, exist_ok=True)
     assignments_html_path.parent.mkdir(parents=True, exist_ok=True)
     submitted_html_path.parent.mkdir(parents=True, exist_ok=True)
     submitted_new_attempt_html_path.parent.mkdir(parents=True, exist_ok=True)
@@ -398,7 +402,7 @@ async def debug_dump_assignment_samples(
         context = await browser.new_context(storage_state=str(state_path))
         page = await context.new_page()
         try:
-            await page.goto(portal_url, wait_until="domcontentloaded", timeout=timeout_ms)
+            await goto_portal(page=page, portal_url=portal_url, portal_html_path=portal_html_path, timeout_ms=timeout_ms)
             courses = await eval_courses_on_portal_page(page=page)
             matched = [c for c in courses if course_query in c.name]
             if not matched:
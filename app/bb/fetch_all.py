@@ -100,6 +100,20 @@ def _find_menu_href(entry_html: str, menu_titles: list[str]) -> str:
     return ""
 
 
+async def _drain_parsed(parsed: list[tuple[str, asyncio.Task]], *, course: Course, items: list[Item], errors: list[dict]) -> None:
+    """
+    Await background page parses in board order; append their Items, or one error per failed board.
+    """
+    while parsed:
+        board, task = parsed.pop(0)
+        try:
+            rows = await task
+        except Exception as e:
+            errors.append({"kind": "exception", "course_id": course.course_id, "course_name": course.name, "board": board, "error": repr(e)})
+            continue
+        items.extend(_as_item(d) for d in rows)
+
+
 @dataclass(frozen=True)
 class FetchAllResult:
     courses: list[Course]
@@ -120,6 +134,7 @@ async def fetch_all_items(
     if not state_path.exists():
         raise FileNotFoundError(f"storage_state not found: {state_path}")
 
+    import asyncio
     from urllib.parse import urljoin
 
     from playwright.async_api import async_playwright
@@ -140,6 +155,8 @@ async def fetch_all_items(
 
             for course in courses:
                 course_url = urljoin(portal_url, course.url)
+                # Parsing is CPU-bound: it runs in worker threads while the page navigates to the next board.
+                parsed: list[tuple[str, asyncio.Task]] = []
                 try:
                     await _safe_goto(page=page, url=course_url, wait_until="domcontentloaded", timeout_ms=timeout_ms, retries=3)
                     await page.wait_for_timeout(300)
@@ -147,19 +164,15 @@ async def fetch_all_items(
                     entry_html = await page.content()
 
                     # 1) Announcements: course entry URL is already in announcements context.
-                    try:
-                        anns = parse_announcements_html(
-                            html=entry_html,
-                            page_url=course_entry_url,
-                            base_url=portal_url,
-                            course_id=course.course_id,
-                            course_name=course.name,
-                        )
-                        all_items.extend(_as_item(d) for d in anns)
-                    except Exception as e:
-                        errors.append(
-                            {"course_id": course.course_id, "course_name": course.name, "board": "announcement", "error": repr(e)}
-                        )
+                    anns = asyncio.to_thread(
+                        parse_announcements_html,
+                        html=entry_html,
+                        page_url=course_entry_url,
+                        base_url=portal_url,
+                        course_id=course.course_id,
+                        course_name=course.name,
+                    )
+                    parsed.append(("announcement", asyncio.create_task(anns)))
 
                     # 2) Teaching content
                     teaching_href = _find_menu_href(entry_html, ["教学内容", "课程内容", "Course Content"])
@@ -169,14 +182,15 @@ async def fetch_all_items(
                             await _safe_goto(page=page, url=teaching_url, wait_until="domcontentloaded", timeout_ms=timeout_ms, retries=3)
                             await page.wait_for_timeout(300)
                             teaching_html = await page.content()
-                            tc = parse_teaching_content_html(
+                            tc = asyncio.to_thread(
+                                parse_teaching_content_html,
                                 html=teaching_html,
                                 page_url=page.url,
                                 base_url=portal_url,
                                 course_id=course.course_id,
                                 course_name=course.name,
                             )
-                            all_items.extend(_as_item(d) for d in tc)
+                            parsed.append(("teaching_content", asyncio.create_task(tc)))
                         except Exception as e:
                             errors.append(
                                 {
@@ -206,7 +220,8 @@ async def fetch_all_items(
                             await _safe_goto(page=page, url=assignments_url, wait_until="domcontentloaded", timeout_ms=timeout_ms, retries=3)
                             await page.wait_for_timeout(300)
                             assignments_html = await page.content()
-                            ass = parse_assignments_html(
+                            ass = await asyncio.to_thread(
+                                parse_assignments_html,
                                 html=assignments_html,
                                 page_url=page.url,
                                 base_url=portal_url,
@@ -276,6 +291,8 @@ async def fetch_all_items(
                                             "error": repr(e),
                                         }
                                     )
+                            # Keep board order: earlier boards' parses land before the assignments.
+                            await _drain_parsed(parsed, course=course, items=all_items, errors=errors)
                             all_items.extend(_as_item(d) for d in ass)
                         except Exception as e:
                             errors.append(
@@ -300,18 +317,20 @@ async def fetch_all_items(
                             await _safe_goto(page=page, url=grades_url, wait_until="domcontentloaded", timeout_ms=timeout_ms, retries=3)
                             await page.wait_for_timeout(300)
                             grades_html = await page.content()
-                            gi = parse_grades_html(
+                            gi = asyncio.to_thread(
+                                parse_grades_html,
                                 html=grades_html,
                                 base_url=portal_url,
                                 course_id=course.course_id,
                                 course_name=course.name,
                             )
-                            all_items.extend(_as_item(d) for d in gi)
+                            parsed.append(("grades", asyncio.create_task(gi)))
                         except Exception as e:
                             errors.append({"kind": "exception", "course_id": course.course_id, "course_name": course.name, "board": "grades", "error": repr(e)})
                     else:
                         errors.append({"kind": "missing_menu", "course_id": course.course_id, "course_name": course.name, "board": "grades", "error": "menu link not found"})
 
+                    await _drain_parsed(parsed, course=course, items=all_items, errors=errors)
                     logger.info(
                         "fetched course: %s (course_id=%s) total_items=%d",
                         course.name,
@@ -321,6 +340,9 @@ async def fetch_all_items(
                 except Exception as e:
                     errors.append({"kind": "exception", "course_id": course.course_id, "course_name": course.name, "board": "course", "error": repr(e)})
                     continue
+                finally:
+                    # Boards parsed before a course-level failure still count (no-op after a clean pass).
+                    await _drain_parsed(parsed, course=course, items=all_items, errors=errors)
 
             return FetchAllResult(courses=courses, items=all_items, errors=errors)
         finally:
@@ -4,14 +4,14 @@ import logging
 from dataclasses import dataclass
 from pathlib import Path
 
-from app.bb.courses import Course, eval_courses_on_portal_page
+from app.bb.courses import Course, eval_courses_on_portal_page, goto_portal
 
 logger = logging.getLogger(__name__)
 
 
 def parse_grades_html(
     *,
-    html: str,
+    html: str | bytes,
     base_url: str = "",
     course_id: str = "",
     course_name: str = "",
@@ -22,6 +22,10 @@ def parse_grades_html(
     from html.parser import HTMLParser
     from urllib.parse import urljoin
 
+    if isinstance(html, bytes):
+        # Saved pages are UTF-8; accepting bytes spares callers a text-mode read.
+        html = html.decode("utf-8")
+
     class _Text(HTMLParser):
         def __init__(self) -> None:
             super().__init__()
@@ -224,9 +228,7 @@ async def debug_dump_grades(
         context = await browser.new_context(storage_state=str(state_path))
         page = await context.new_page()
         try:
-            await page.goto(portal_url, wait_until="domcontentloaded", timeout=timeout_ms)
-            portal_html_path.write_text(await page.content(), encoding="utf-8")
-            logger.info("saved debug portal html: %s", portal_html_path)
+            await goto_portal(page=page, portal_url=portal_url, portal_html_path=portal_html_path, timeout_ms=timeout_ms)
 
             courses = await eval_courses_on_portal_page(page=page)
             matched = [c for c in courses if course_query in c.name]
@@ -9,7 +9,7 @@ try:
 except Exception:  # pragma: no cover
     load_dotenv = None  # type: ignore[assignment]
 
-def _load_dotenv_fallback(dotenv_path: Path) -> None:
+def _load_dotenv_fallback(dotenv_path: Path, override: bool = False) -> None:
     if not dotenv_path.exists():
         return
     import os
@@ -25,7 +25,10 @@ def _load_dotenv_fallback(dotenv_path: Path) -> None:
         value = value.strip().strip("'").strip('"')
         if not key:
             continue
-        os.environ.setdefault(key, value)
+        if override:
+            os.environ[key] = value
+        else:
+            os.environ.setdefault(key, value)
 
 
 def _as_bool(value: Optional[str], default: bool) -> bool:
@@ -56,12 +59,16 @@ class Config:
     log_path: Path
 
 
-def load_config(project_root: Path) -> Config:
+def load_config(project_root: Path, *, override: bool = False) -> Config:
+    """
+    Build Config from `.env` + environment. With override=True, `.env` values win over
+    variables already in the environment (used when a long-running process reloads).
+    """
     dotenv_path = project_root / ".env"
     if load_dotenv is not None:
-        load_dotenv(dotenv_path, override=False)
+        load_dotenv(dotenv_path, override=override)
     else:
-        _load_dotenv_fallback(dotenv_path)
+        _load_dotenv_fallback(dotenv_path, override=override)
 
     def getenv(name: str, default: str = "") -> str:
         import os
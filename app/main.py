@@ -1,204 +1,459 @@
 from __future__ import annotations
 
 import argparse
-import asyncio
-import json
+import functools
 import logging
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator
 
-from app.bb import (
-    check_login,
-    debug_dump_course_announcements,
-    debug_dump_assignment_samples,
-    debug_dump_assignments,
-    debug_dump_grades,
-    debug_dump_teaching_content,
-    ensure_login,
-    fetch_all_items,
-    fetch_courses_from_portal,
-    parse_announcements_html,
-    parse_assignments_html,
-    parse_grades_html,
-    parse_teaching_content_html,
-)
-from app.config import load_config
+from app.config import Config, load_config
 from app.logging_utils import setup_logging
-from app.notify import message_for_new_item, message_for_updated_item, send_bark
-from app.store import init_db
+
+if TYPE_CHECKING:
+    from app.bb.courses import Course
+    from app.models import Item
+    from app.store import Record
 
 
 logger = logging.getLogger(__name__)
 
 
-def _project_root() -> Path:
-    return Path(__file__).resolve().parents[1]
+# Resolved once at import; main() and the daemon reload reuse it.
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
 
 
-def main(argv: list[str] | None = None) -> int:
-    parser = argparse.ArgumentParser(prog="pku-bb-watcher")
-    parser.add_argument("--check-login", action="store_true", help="Open a page using storage_state and log title/url.")
-    parser.add_argument("--list-courses", action="store_true", help="Dump portal HTML and extract student courses.")
-    parser.add_argument("--debug-announcements", action="store_true", help="Dump HTML for one course announcements page.")
-    parser.add_argument("--debug-teaching-content", action="store_true", help='Dump HTML for one course "教学内容" page.')
-    parser.add_argument("--debug-assignments", action="store_true", help='Dump HTML for one course "课程作业" page.')
-    parser.add_argument(
-        "--debug-assignment-samples",
-        action="store_true",
-        help='Dump two assignment detail HTML pages (submitted/unsubmitted samples) for one course.',
+def _write_json(path: Path, obj: object) -> None:
+    """
+    Write `obj` as pretty-printed UTF-8 JSON (with trailing newline).
+    Uses orjson when installed (much faster on large exports), otherwise the stdlib encoder.
+    Lists and iterators are streamed one element at a time (as a JSON array), so a large export never
+    exists as one big string.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        import orjson
+
+        def dumps(o: object) -> bytes:
+            return orjson.dumps(o, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    except ImportError:
+        import json
+
+        def dumps(o: object) -> bytes:
+            return json.dumps(o, ensure_ascii=False, indent=2).encode("utf-8")
+
+    if not isinstance(obj, (list, Iterator)):
+        path.write_bytes(dumps(obj) + b"\n")
+        return
+    # Same bytes as dumping the whole list with indent=2: JSON strings never hold a raw newline,
+    # so shifting each element's lines by two spaces nests it correctly.
+    with path.open("wb") as f:
+        sep = b"[\n  "
+        for el in obj:
+            f.write(sep)
+            f.write(dumps(el).replace(b"\n", b"\n  "))
+            sep = b",\n  "
+        f.write(b"[]\n" if sep == b"[\n  " else b"\n]\n")
+
+
+def _log_items(items: list, log_item: Callable[[Any], None], level: int = logging.INFO) -> None:
+    # Gate the whole loop: the per-item .get() calls run before logging can drop the record.
+    if logger.isEnabledFor(level):
+        for it in items:
+            log_item(it)
+
+
+def _log_course(c: Course) -> None:
+    extra = f" (course_id={c.course_id})" if c.course_id else ""
+    logger.info("course: %s%s | %s", c.name, extra, c.url)
+
+
+def _log_fetch_error(e: dict) -> None:
+    logger.warning(
+        "fetch-all error: course=%s (%s) board=%s err=%s",
+        e.get("course_name", ""),
+        e.get("course_id", ""),
+        e.get("board", ""),
+        e.get("error", ""),
     )
-    parser.add_argument("--debug-grades", action="store_true", help='Dump HTML for one course "个人成绩" page.')
-    parser.add_argument("--fetch-all", action="store_true", help="Fetch all courses and all boards into unified Items.")
-    parser.add_argument("--run", action="store_true", help="Fetch all items and push Bark notifications (Step E).")
-    parser.add_argument("--dry-run", action="store_true", help="Do not push; only log pending notifications.")
-    parser.add_argument(
-        "--dry-run-out",
-        default="",
-        help="When used with --run --dry-run, write Bark message previews to this file (JSON).",
+
+
+def _log_announcement(a: dict) -> None:
+    logger.info(
+        "announcement: %s (%s) | %s | %s",
+        a.get("published_at", ""),
+        a.get("published_at_raw", ""),
+        a.get("title", ""),
+        a.get("url", ""),
     )
-    parser.add_argument("--course-query", default="", help="Substring to match the target course in portal list.")
-    parser.add_argument("--course-limit", type=int, default=0, help="Limit courses fetched for --fetch-all (0 = no limit).")
-    parser.add_argument("--limit", type=int, default=0, help="Limit pushes for --run (0 = use POLL_LIMIT_PER_RUN).")
-    parser.add_argument("--submitted-assignment-query", default="", help="Substring to match the submitted assignment title.")
-    parser.add_argument("--unsubmitted-assignment-query", default="", help="Substring to match the unsubmitted assignment title.")
-    parser.add_argument("--parse-announcements-html", default="", help="Parse a saved announcements HTML file (offline).")
-    parser.add_argument("--parse-teaching-content-html", default="", help='Parse a saved "教学内容" HTML file (offline).')
-    parser.add_argument("--parse-assignments-html", default="", help='Parse a saved "课程作业" HTML file (offline).')
-    parser.add_argument("--announcements-json", default="", help="Write parsed announcements to a JSON file.")
-    parser.add_argument("--teaching-content-json", default="", help='Write parsed "教学内容" items to a JSON file.')
-    parser.add_argument("--assignments-json", default="", help='Write parsed "课程作业" items to a JSON file.')
-    parser.add_argument("--parse-grades-html", default="", help='Parse a saved "个人成绩" HTML file (offline).')
-    parser.add_argument("--grades-json", default="", help='Write parsed "个人成绩" items to a JSON file.')
-    parser.add_argument("--items-json", default="", help="Write unified Items to a JSON file (for --fetch-all).")
-    args = parser.parse_args(argv)
 
-    root = _project_root()
-    config = load_config(root)
-    setup_logging(config.log_path)
 
-    logger.info("config loaded")
-    init_db(config.db_path)
-    logger.info("db init ok: %s", config.db_path)
+def _log_teaching_content(it: dict) -> None:
+    if it.get("source") == "assignment":
+        logger.info(
+            "assignment(in content): online=%s | %s | %s",
+            it.get("is_online_submission", False),
+            it.get("title", ""),
+            it.get("url", ""),
+        )
+    else:
+        logger.info(
+            "teaching_content: %s | attachments=%s | %s",
+            it.get("title", ""),
+            it.get("has_attachments", False),
+            it.get("url", ""),
+        )
 
-    if args.announcements_json and not (args.parse_announcements_html or args.debug_announcements):
-        logger.error("--announcements-json must be used with --parse-announcements-html or --debug-announcements")
-        return 2
-    if args.teaching_content_json and not (args.parse_teaching_content_html or args.debug_teaching_content):
-        logger.error("--teaching-content-json must be used with --parse-teaching-content-html or --debug-teaching-content")
-        return 2
-    if args.assignments_json and not (args.parse_assignments_html or args.debug_assignments):
-        logger.error("--assignments-json must be used with --parse-assignments-html or --debug-assignments")
-        return 2
-    if args.grades_json and not (args.parse_grades_html or args.debug_grades):
-        logger.error("--grades-json must be used with --parse-grades-html or --debug-grades")
-        return 2
-    if args.items_json and not args.fetch_all:
-        logger.error("--items-json must be used with --fetch-all")
-        return 2
-    if args.dry_run and not args.run:
-        logger.error("--dry-run must be used with --run")
-        return 2
-    if args.dry_run_out and not (args.run and args.dry_run):
-        logger.error("--dry-run-out must be used with --run --dry-run")
+
+def _log_assignment(it: dict) -> None:
+    logger.info(
+        "assignment: online=%s | %s | %s",
+        it.get("is_online_submission", False),
+        it.get("title", ""),
+        it.get("url", ""),
+    )
+
+
+def _log_grade(it: dict) -> None:
+    logger.info(
+        "grade_item: %s | cat=%s | due=%s | last=%s | grade=%s/%s",
+        it.get("title", ""),
+        it.get("category", ""),
+        it.get("duedate_display", "") or it.get("duedate", ""),
+        it.get("lastactivity", "") or it.get("lastactivity_display", ""),
+        it.get("grade_raw", ""),
+        it.get("points_possible_raw", ""),
+    )
+
+
+# --parse-*-html: (html flag, json flag, app.bb parser, log label, items logged, per-item logger).
+_PARSE_DISPATCH: tuple[tuple[str, str, str, str, int, Callable[[dict], None]], ...] = (
+    ("parse_announcements_html", "announcements_json", "parse_announcements_html", "announcements", 10, _log_announcement),
+    ("parse_teaching_content_html", "teaching_content_json", "parse_teaching_content_html", "teaching content", 10, _log_teaching_content),
+    ("parse_assignments_html", "assignments_json", "parse_assignments_html", "assignments", 15, _log_assignment),
+    ("parse_grades_html", "grades_json", "parse_grades_html", "grades", 15, _log_grade),
+)
+
+
+# Output/modifier flags and the commands they need (any one of them).
+_REQUIRES: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("announcements_json", ("parse_announcements_html", "debug_announcements")),
+    ("teaching_content_json", ("parse_teaching_content_html", "debug_teaching_content")),
+    ("assignments_json", ("parse_assignments_html", "debug_assignments")),
+    ("grades_json", ("parse_grades_html", "debug_grades")),
+    ("items_json", ("fetch_all",)),
+    ("dry_run", ("run",)),
+    ("daemon", ("run",)),
+    ("interval", ("daemon",)),
+)
+
+# --daemon cycle spacing. Each cycle logs in and crawls every course, so don't let it spin.
+_DEFAULT_INTERVAL_S = 600
+_MIN_INTERVAL_S = 30
+
+
+def _flag(dest: str) -> str:
+    return "--" + dest.replace("_", "-")
+
+
+# Sources whose updates (not just first sighting) are worth a push.
+_UPDATE_PUSH_SOURCES = frozenset({"grade_item", "assignment"})
+
+
+def _classify(it: Item, fp: str, state_fp: str, rec: Record | None, msg_new: Callable, msg_upd: Callable) -> tuple | None:
+    """
+    Decide what --run does with one fetched item (fingerprints precomputed), given its DB record
+    (None if unseen).
+
+    Returns ("push", priority, fp, state_fp, msg), ("ack", fp, state_fp), or None when nothing changed.
+    """
+    sent_state_fp = rec.sent_state_fp.strip() if rec is not None else ""
+
+    # Never notified (new or previously failed pushes).
+    if not sent_state_fp:
+        msg = msg_new(it.to_dict())
+        return ("push", 100, fp, state_fp, msg) if msg else None
+
+    # No change since last notification.
+    if sent_state_fp == state_fp:
+        return None
+
+    # Updates: notify only for grade_item/assignment; others are acked to avoid noisy repeats.
+    if it.source in _UPDATE_PUSH_SOURCES:
+        msg = msg_upd(new_item=it.to_dict(), old_raw=rec.raw)
+        if msg:
+            return ("push", 200, fp, state_fp, msg)
+    return ("ack", fp, state_fp)
+
+
+def _run_once(args: argparse.Namespace, config: Config, root: Path) -> int:
+    """
+    One --run cycle: ensure login, fetch everything, diff against the DB, push and record.
+    """
+    import asyncio
+    import heapq
+
+    from app.bb import ensure_login, fetch_all_items
+    from app.models import Item
+    from app.notify import message_for_new_item, message_for_updated_item, send_bark, send_bark_many
+    from app.store import (
+        ack_state,
+        connect,
+        fetch_records,
+        fetch_state,
+        get_notification_counts,
+        mark_notified,
+        optimize,
+        upsert_new,
+        upsert_seen,
+        upsert_updated,
+    )
+
+    portal_url = config.bb_courses_url or config.bb_base_url
+
+    async def login_and_fetch():
+        # One event loop for both browser sessions of the cycle.
+        login = await ensure_login(
+            state_path=config.bb_state_path,
+            login_url=config.bb_login_url or config.bb_base_url,
+            verify_url=portal_url,
+            headless=config.headless,
+            username=config.bb_username,
+            password=config.bb_password,
+        )
+        if not login.ok:
+            return login, None
+        return login, await fetch_all_items(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            headless=config.headless,
+            course_limit=args.course_limit,
+        )
+
+    login, result = asyncio.run(login_and_fetch())
+    if not login.ok:
+        logger.error("login not ok: %s", login.note or login.final_url)
         return 2
 
-    if args.parse_announcements_html:
-        html_path = Path(args.parse_announcements_html)
-        html = html_path.read_text(encoding="utf-8")
-        announcements = parse_announcements_html(html=html, base_url=config.bb_base_url)
-        logger.info("parsed announcements from %s: %d", html_path, len(announcements))
-        if args.announcements_json:
-            out_path = Path(args.announcements_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(announcements, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            logger.info("wrote announcements json: %s", out_path)
-        for a in announcements[:10]:
-            logger.info(
-                "announcement: %s (%s) | %s | %s",
-                a.get("published_at", ""),
-                a.get("published_at_raw", ""),
-                a.get("title", ""),
-                a.get("url", ""),
-            )
+    # The fetch doesn't touch the DB, so counting after it sees the same state as before.
+    total_rows, notified_rows = get_notification_counts(config.db_path)
+    is_bootstrap = notified_rows == 0
+
+    items = result.items
+
+    # First-run behavior: avoid spamming historical items.
+    # If the DB has no notified rows yet, send one initialization message and mark all current items as notified.
+    if is_bootstrap:
+        endpoint = (config.bark_endpoint or "").strip()
+        init_title = "PKU-BlackBoard-Watcher 初始化完成"
+        init_body = (
+            f"已同步历史记录：{len(items)} 条（课程：{len(result.courses)} 门）\n"
+            "后续仅推送新增/变更。"
+        )
+        logger.info("bootstrap mode: db_total=%d db_notified=%d items=%d courses=%d", total_rows, notified_rows, len(items), len(result.courses))
+
+        if args.dry_run:
+            # Still write preview file if requested; do not touch DB.
+            preview_out = Path(args.dry_run_out) if args.dry_run_out else (root / "data" / "bark_dry_run.json")
+            payload = {
+                "bootstrap": True,
+                "db_total": total_rows,
+                "db_notified": notified_rows,
+                "items_total": len(items),
+                "courses_total": len(result.courses),
+                "messages": [{"title": init_title, "body": init_body, "url": ""}],
+                "note": "bootstrap would mark all current items as notified",
+            }
+            _write_json(preview_out, payload)
+            logger.info("wrote dry-run bark preview: %s", preview_out)
+            logger.info("done")
+            return 0
+
+        if not endpoint:
+            logger.error("bootstrap requires BARK_ENDPOINT to send the initialization message")
+            return 2
+
+        # Upsert first so mark_notified has rows to update. The push happens outside any
+        # transaction so the DB write lock is never held across network I/O.
+        with connect(config.db_path) as conn:
+            upsert_seen(conn, items)
+        try:
+            send_bark(endpoint=endpoint, title=init_title, body=init_body, url="")
+        except Exception as e:
+            logger.error("bootstrap bark push failed (%s): %s", type(e).__name__, str(e)[:120])
+            return 2
+        with connect(config.db_path) as conn:
+            mark_notified(conn, list(zip(*Item.fingerprint_many(items))))
+        logger.info("bootstrap done: marked %d items as notified", len(items))
+        optimize(config.db_path)
         logger.info("done")
         return 0
 
-    if args.parse_teaching_content_html:
-        html_path = Path(args.parse_teaching_content_html)
-        html = html_path.read_text(encoding="utf-8")
-        items = parse_teaching_content_html(html=html, base_url=config.bb_base_url)
-        logger.info('parsed teaching content from %s: %d', html_path, len(items))
-        if args.teaching_content_json:
-            out_path = Path(args.teaching_content_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(items, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            logger.info("wrote teaching content json: %s", out_path)
-        for it in items[:10]:
-            if it.get("source") == "assignment":
-                logger.info(
-                    "assignment(in content): online=%s | %s | %s",
-                    it.get("is_online_submission", False),
-                    it.get("title", ""),
-                    it.get("url", ""),
-                )
+    fps, state_fps = Item.fingerprint_many(items)
+    # One fetch can yield several items with the same identity (e.g. an assignment listed under both
+    # 教学内容 and 课程作业). Keep only the last of each, as the full upsert used to, so the stored row
+    # doesn't flip between the duplicates on every run.
+    last_index = {fp: i for i, fp in enumerate(fps)}
+    if len(last_index) != len(fps):
+        keep = sorted(last_index.values())
+        items = [items[i] for i in keep]
+        fps = [fps[i] for i in keep]
+        state_fps = [state_fps[i] for i in keep]
+    existing = fetch_state(config.db_path, fps)
+    # Old raw is only needed for updates that may be pushed (message_for_updated_item diffs against it).
+    diff_fps = [
+        fp
+        for it, fp, state_fp in zip(items, fps, state_fps)
+        if it.source in _UPDATE_PUSH_SOURCES
+        and (rec := existing.get(fp)) is not None
+        and rec.sent_state_fp.strip() not in ("", state_fp)
+    ]
+    if diff_fps:
+        existing.update(fetch_records(config.db_path, diff_fps))
+
+    classified = [
+        _classify(it, fp, state_fp, existing.get(fp), message_for_new_item, message_for_updated_item)
+        for it, fp, state_fp in zip(items, fps, state_fps)
+    ]
+    pending: list[tuple[int, str, str, object]] = [c[1:] for c in classified if c and c[0] == "push"]
+    # Only rows that are missing or whose state changed need writing; unchanged rows stay untouched.
+    # Push sources also go to upsert_updated so raw keys outside state_fp (submission_url,
+    # duedate_display) stay current for the next update message; it skips rows whose raw is unchanged.
+    new_items: list[Item] = []
+    changed_items: list[Item] = []
+    for it, fp, state_fp in zip(items, fps, state_fps):
+        rec = existing.get(fp)
+        if rec is None:
+            new_items.append(it)
+        elif rec.state_fp != state_fp or it.source in _UPDATE_PUSH_SOURCES:
+            changed_items.append(it)
+    ack_pairs: list[tuple[str, str]] = [c[1:] for c in classified if c and c[0] == "ack"]
+
+    limit = args.limit if args.limit and args.limit > 0 else int(config.poll_limit_per_run)
+    # Highest priority first, then fp for a stable order; only the first `limit` entries are needed.
+    order = lambda t: (-t[0], t[1])  # noqa: E731
+    to_send = heapq.nsmallest(limit, pending, key=order) if limit > 0 else sorted(pending, key=order)
+
+    endpoint = (config.bark_endpoint or "").strip()
+    sent_pairs: list[tuple[str, str]] = []
+    preview_out = Path(args.dry_run_out) if args.dry_run_out else (root / "data" / "bark_dry_run.json")
+
+    logger.info("run summary: items=%d pending=%d limit=%d", len(items), len(pending), limit)
+    if not endpoint:
+        logger.warning("BARK_ENDPOINT is empty; will not push (use --dry-run to silence this).")
+
+    previews: list[dict] = []
+    to_push: list[tuple[str, str, object]] = []
+    # Short write transactions only: latest state and acks are committed before any push, and the
+    # notified marks right after, so the write lock is never held across Bark HTTP calls and a
+    # failure after pushing can't roll back the record of what was already sent.
+    with connect(config.db_path) as conn:
+        # Record latest state first; sent_state_fp is tracked separately.
+        upsert_new(conn, new_items)
+        upsert_updated(conn, changed_items)
+
+        # Ack ignored updates so they won't keep showing up as pending.
+        if ack_pairs:
+            ack_state(conn, ack_pairs)
+
+    for _, fp, state_fp, msg in to_send:
+        # msg is BarkMessage, but keep runtime decoupled.
+        title = getattr(msg, "title", "")
+        body = getattr(msg, "body", "")
+        url = getattr(msg, "url", "")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("push planned: %s | %s", title, body.partition("\n")[0])
+        if args.dry_run:
+            previews.append({"fp": fp, "state_fp": state_fp, "title": title, "body": body, "url": url})
+        if args.dry_run or not endpoint:
+            continue
+        to_push.append((fp, state_fp, msg))
+
+    if to_push:
+        errors = send_bark_many(endpoint=endpoint, messages=[msg for _, _, msg in to_push])
+        for (fp, state_fp, _), e in zip(to_push, errors):
+            if e is None:
+                sent_pairs.append((fp, state_fp))
             else:
-                logger.info(
-                    "teaching_content: %s | attachments=%s | %s",
-                    it.get("title", ""),
-                    it.get("has_attachments", False),
-                    it.get("url", ""),
-                )
-        logger.info("done")
-        return 0
+                logger.error("bark push failed (%s): %s", type(e).__name__, str(e)[:120])
 
-    if args.parse_assignments_html:
-        html_path = Path(args.parse_assignments_html)
-        html = html_path.read_text(encoding="utf-8")
-        items = parse_assignments_html(html=html, base_url=config.bb_base_url)
-        logger.info('parsed assignments from %s: %d', html_path, len(items))
-        if args.assignments_json:
-            out_path = Path(args.assignments_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(items, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            logger.info("wrote assignments json: %s", out_path)
-        for it in items[:15]:
-            logger.info(
-                "assignment: online=%s | %s | %s",
-                it.get("is_online_submission", False),
-                it.get("title", ""),
-                it.get("url", ""),
-            )
-        logger.info("done")
-        return 0
+    if sent_pairs and not args.dry_run and endpoint:
+        with connect(config.db_path) as conn:
+            mark_notified(conn, sent_pairs)
+        logger.info("pushed: %d", len(sent_pairs))
+
+    if args.dry_run:
+        payload = {
+            "items_total": len(items),
+            "pending_total": len(pending),
+            "limit": limit,
+            "messages": previews,
+        }
+        _write_json(preview_out, payload)
+        logger.info("wrote dry-run bark preview: %s", preview_out)
+    optimize(config.db_path)
+    logger.info("done")
+    return 0
 
-    if args.parse_grades_html:
-        html_path = Path(args.parse_grades_html)
-        html = html_path.read_text(encoding="utf-8")
-        items = parse_grades_html(html=html, base_url=config.bb_base_url)
-        logger.info('parsed grades from %s: %d', html_path, len(items))
-        if args.grades_json:
-            out_path = Path(args.grades_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(items, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            logger.info("wrote grades json: %s", out_path)
-        for it in items[:15]:
-            logger.info(
-                "grade_item: %s | cat=%s | last=%s | grade=%s/%s",
-                it.get("title", ""),
-                it.get("category", ""),
-                it.get("lastactivity", "") or it.get("lastactivity_display", ""),
-                it.get("grade_raw", ""),
-                it.get("points_possible_raw", ""),
-            )
-        logger.info("done")
-        return 0
 
+def _run_daemon(args: argparse.Namespace, config: Config, root: Path) -> int:
+    """
+    Stay resident and repeat --run every --interval seconds (imports and DB setup are paid once).
+    SIGHUP re-reads .env/config before the next cycle.
+    """
+    import signal
+    import time
+
+    from app.store import close_db, init_db
+
+    reload_requested = False
+
+    def on_sighup(signum, frame) -> None:
+        nonlocal reload_requested
+        reload_requested = True
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, on_sighup)
+
+    logger.info("daemon mode: interval=%ds", args.interval)
+    while True:
+        if reload_requested:
+            reload_requested = False
+            try:
+                new_config = load_config(root, override=True)
+                init_db(new_config.db_path)
+                if new_config.db_path != config.db_path:
+                    # Don't keep the old DB open (and its WAL locked) for the rest of the daemon's life.
+                    close_db(config.db_path)
+            except Exception as e:
+                # A bad .env edit must not take the daemon down; carry on with what was loaded before.
+                logger.error("config reload failed, keeping previous config (%s): %s", type(e).__name__, str(e)[:200])
+            else:
+                config = new_config
+                logger.info("config reloaded")
+        try:
+            rc = _run_once(args, config, root)
+            if rc:
+                logger.warning("run cycle exited with %d", rc)
+        except Exception as e:
+            # Keep the daemon alive across transient failures (network, expired login, ...).
+            logger.error("run cycle failed (%s): %s", type(e).__name__, str(e)[:200])
+        time.sleep(args.interval)
+
+
+async def _run_online(args: argparse.Namespace, config: Config, root: Path) -> int | None:
+    """
+    The browser-driven commands (--check-login, --list-courses, --fetch-all, --debug-*) on one event loop.
+    Returns the exit code, or None when --run should take over.
+    """
+    portal_url = config.bb_courses_url or config.bb_base_url
     if args.check_login:
-        result = asyncio.run(
-            check_login(
-                state_path=config.bb_state_path,
-                check_url=config.bb_courses_url or config.bb_base_url,
-                headless=config.headless,
-            )
+        from app.bb import check_login
+
+        result = await check_login(
+            state_path=config.bb_state_path,
+            check_url=portal_url,
+            headless=config.headless,
         )
         if result.ok:
             logger.info("login ok: %s (%s)", result.title, result.final_url)
@@ -207,28 +462,26 @@ def main(argv: list[str] | None = None) -> int:
             return 2
 
     if args.list_courses:
+        from app.bb import fetch_courses_from_portal
+
         debug_html_path = root / "data" / "debug_courses.html"
-        courses = asyncio.run(
-            fetch_courses_from_portal(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                headless=config.headless,
-                debug_html_path=debug_html_path,
-            )
+        courses = await fetch_courses_from_portal(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            headless=config.headless,
+            debug_html_path=debug_html_path,
         )
         logger.info("courses found: %d", len(courses))
-        for c in courses[:30]:
-            extra = f" (course_id={c.course_id})" if getattr(c, "course_id", "") else ""
-            logger.info("course: %s%s | %s", c.name, extra, c.url)
+        _log_items(courses[:30], _log_course)
 
     if args.fetch_all:
-        result = asyncio.run(
-            fetch_all_items(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                headless=config.headless,
-                course_limit=args.course_limit,
-            )
+        from app.bb import fetch_all_items
+
+        result = await fetch_all_items(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            headless=config.headless,
+            course_limit=args.course_limit,
         )
         logger.info("fetch-all courses: %d", len(result.courses))
         logger.info("fetch-all items: %d", len(result.items))
@@ -239,200 +492,31 @@ def main(argv: list[str] | None = None) -> int:
                 logger.info("fetch-all skipped boards (menu missing): %d", len(skipped))
             if hard:
                 logger.warning("fetch-all errors: %d", len(hard))
-                for e in hard[:20]:
-                    logger.warning(
-                        "fetch-all error: course=%s (%s) board=%s err=%s",
-                        e.get("course_name", ""),
-                        e.get("course_id", ""),
-                        e.get("board", ""),
-                        e.get("error", ""),
-                    )
+                _log_items(hard[:20], _log_fetch_error, logging.WARNING)
         if args.items_json:
             out_path = Path(args.items_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(
-                json.dumps([it.to_dict() for it in result.items], ensure_ascii=False, indent=2) + "\n",
-                encoding="utf-8",
-            )
+            _write_json(out_path, (it.to_dict() for it in result.items))
             logger.info("wrote items json: %s", out_path)
         logger.info("done")
         return 0
 
     if args.run:
-        from app.store import ack_state, fetch_records, get_notification_counts, mark_notified, upsert_seen
-
-        login = asyncio.run(
-            ensure_login(
-                state_path=config.bb_state_path,
-                login_url=config.bb_login_url or config.bb_base_url,
-                verify_url=config.bb_courses_url or config.bb_base_url,
-                headless=config.headless,
-                username=config.bb_username,
-                password=config.bb_password,
-            )
-        )
-        if not login.ok:
-            logger.error("login not ok: %s", login.note or login.final_url)
-            return 2
-
-        total_rows, notified_rows = get_notification_counts(config.db_path)
-        is_bootstrap = notified_rows == 0
-
-        result = asyncio.run(
-            fetch_all_items(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                headless=config.headless,
-                course_limit=args.course_limit,
-            )
-        )
-        items = result.items
-
-        # First-run behavior: avoid spamming historical items.
-        # If the DB has no notified rows yet, send one initialization message and mark all current items as notified.
-        if is_bootstrap:
-            endpoint = (config.bark_endpoint or "").strip()
-            init_title = "PKU-BlackBoard-Watcher 初始化完成"
-            init_body = (
-                f"已同步历史记录：{len(items)} 条（课程：{len(result.courses)} 门）\n"
-                "后续仅推送新增/变更。"
-            )
-            logger.info("bootstrap mode: db_total=%d db_notified=%d items=%d courses=%d", total_rows, notified_rows, len(items), len(result.courses))
-
-            if args.dry_run:
-                # Still write preview file if requested; do not touch DB.
-                preview_out = Path(args.dry_run_out) if args.dry_run_out else (root / "data" / "bark_dry_run.json")
-                preview_out.parent.mkdir(parents=True, exist_ok=True)
-                payload = {
-                    "bootstrap": True,
-                    "db_total": total_rows,
-                    "db_notified": notified_rows,
-                    "items_total": len(items),
-                    "courses_total": len(result.courses),
-                    "messages": [{"title": init_title, "body": init_body, "url": ""}],
-                    "note": "bootstrap would mark all current items as notified",
-                }
-                preview_out.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-                logger.info("wrote dry-run bark preview: %s", preview_out)
-                logger.info("done")
-                return 0
-
-            if not endpoint:
-                logger.error("bootstrap requires BARK_ENDPOINT to send the initialization message")
-                return 2
-
-            # Upsert first so mark_notified has rows to update.
-            upsert_seen(config.db_path, items)
-            try:
-                send_bark(endpoint=endpoint, title=init_title, body=init_body, url="")
-            except Exception as e:
-                logger.error("bootstrap bark push failed (%s): %s", type(e).__name__, str(e)[:120])
-                return 2
-            mark_notified(config.db_path, [(it.identity_fp(), it.state_fp()) for it in items])
-            logger.info("bootstrap done: marked %d items as notified", len(items))
-            logger.info("done")
-            return 0
-
-        fps = [it.identity_fp() for it in items]
-        existing = fetch_records(config.db_path, fps)
-
-        pending: list[tuple[int, str, str, object]] = []
-        ack_pairs: list[tuple[str, str]] = []
-
-        for it in items:
-            fp = it.identity_fp()
-            state_fp = it.state_fp()
-            rec = existing.get(fp, {})
-            sent_state_fp = (rec.get("sent_state_fp", "") or "").strip()
-
-            # Never notified (new or previously failed pushes).
-            if not sent_state_fp:
-                msg = message_for_new_item(it.to_dict())
-                if msg:
-                    pending.append((100, fp, state_fp, msg))
-                continue
-
-            # No change since last notification.
-            if sent_state_fp == state_fp:
-                continue
-
-            # Updates: notify only for grade_item/assignment; others are acked to avoid noisy repeats.
-            if it.source in {"grade_item", "assignment"}:
-                msg = message_for_updated_item(new_item=it.to_dict(), old_raw=rec.get("raw", {}) or {})
-                if msg:
-                    pending.append((200, fp, state_fp, msg))
-                else:
-                    ack_pairs.append((fp, state_fp))
-            else:
-                ack_pairs.append((fp, state_fp))
-
-        # Always upsert latest state first; sent_state_fp is tracked separately.
-        upsert_seen(config.db_path, items)
-
-        # Ack ignored updates so they won't keep showing up as pending.
-        if ack_pairs:
-            ack_state(config.db_path, ack_pairs)
-
-        limit = args.limit if args.limit and args.limit > 0 else int(config.poll_limit_per_run)
-        pending.sort(key=lambda t: (-t[0], t[1]))
-        to_send = pending[:limit] if limit > 0 else pending
-
-        endpoint = (config.bark_endpoint or "").strip()
-        sent_pairs: list[tuple[str, str]] = []
-        preview_out = Path(args.dry_run_out) if args.dry_run_out else (root / "data" / "bark_dry_run.json")
-
-        logger.info("run summary: items=%d pending=%d limit=%d", len(items), len(pending), limit)
-        if not endpoint:
-            logger.warning("BARK_ENDPOINT is empty; will not push (use --dry-run to silence this).")
-
-        previews: list[dict] = []
-        for _, fp, state_fp, msg in to_send:
-            # msg is BarkMessage, but keep runtime decoupled.
-            title = getattr(msg, "title", "")
-            body = getattr(msg, "body", "")
-            url = getattr(msg, "url", "")
-            logger.info("push planned: %s | %s", title, body.splitlines()[0] if body else "")
-            if args.dry_run:
-                previews.append({"fp": fp, "state_fp": state_fp, "title": title, "body": body, "url": url})
-            if args.dry_run or not endpoint:
-                continue
-            try:
-                send_bark(endpoint=endpoint, title=title, body=body, url=url)
-                sent_pairs.append((fp, state_fp))
-            except Exception as e:
-                logger.error("bark push failed (%s): %s", type(e).__name__, str(e)[:120])
-
-        if args.dry_run:
-            preview_out.parent.mkdir(parents=True, exist_ok=True)
-            payload = {
-                "items_total": len(items),
-                "pending_total": len(pending),
-                "limit": limit,
-                "messages": previews,
-            }
-            preview_out.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            logger.info("wrote dry-run bark preview: %s", preview_out)
-
-        if sent_pairs and not args.dry_run and endpoint:
-            mark_notified(config.db_path, sent_pairs)
-            logger.info("pushed: %d", len(sent_pairs))
-        logger.info("done")
-        return 0
+        return None
 
     if args.debug_announcements:
+        from app.bb import debug_dump_course_announcements
+
         if not args.course_query:
             logger.error("--course-query is required for --debug-announcements")
             return 2
-        result = asyncio.run(
-            debug_dump_course_announcements(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                course_query=args.course_query,
-                headless=config.headless,
-                portal_html_path=root / "data" / "debug_courses.html",
-                course_entry_html_path=root / "data" / "debug_course_entry.html",
-                announcements_html_path=root / "data" / "debug_announcements.html",
-            )
+        result = await debug_dump_course_announcements(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            course_query=args.course_query,
+            headless=config.headless,
+            portal_html_path=root / "data" / "debug_courses.html",
+            course_entry_html_path=root / "data" / "debug_course_entry.html",
+            announcements_html_path=root / "data" / "debug_announcements.html",
         )
         logger.info("debug announcements ok: %s (course_id=%s)", result.course.name, result.course.course_id)
         logger.info("course_entry_url: %s", result.course_entry_url)
@@ -440,32 +524,24 @@ def main(argv: list[str] | None = None) -> int:
         logger.info("announcements found: %d", len(result.announcements))
         if args.announcements_json:
             out_path = Path(args.announcements_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(result.announcements, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            _write_json(out_path, result.announcements)
             logger.info("wrote announcements json: %s", out_path)
-        for a in result.announcements[:10]:
-            logger.info(
-                "announcement: %s (%s) | %s | %s",
-                a.get("published_at", ""),
-                a.get("published_at_raw", ""),
-                a.get("title", ""),
-                a.get("url", ""),
-            )
+        _log_items(result.announcements[:10], _log_announcement)
 
     if args.debug_teaching_content:
+        from app.bb import debug_dump_teaching_content
+
         if not args.course_query:
             logger.error("--course-query is required for --debug-teaching-content")
             return 2
-        result = asyncio.run(
-            debug_dump_teaching_content(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                course_query=args.course_query,
-                headless=config.headless,
-                portal_html_path=root / "data" / "debug_courses.html",
-                course_entry_html_path=root / "data" / "debug_course_entry.html",
-                teaching_content_html_path=root / "data" / "debug_teaching_content.html",
-            )
+        result = await debug_dump_teaching_content(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            course_query=args.course_query,
+            headless=config.headless,
+            portal_html_path=root / "data" / "debug_courses.html",
+            course_entry_html_path=root / "data" / "debug_course_entry.html",
+            teaching_content_html_path=root / "data" / "debug_teaching_content.html",
         )
         logger.info("debug teaching content ok: %s (course_id=%s)", result.course.name, result.course.course_id)
         logger.info("course_entry_url: %s", result.course_entry_url)
@@ -473,39 +549,24 @@ def main(argv: list[str] | None = None) -> int:
         logger.info("teaching content items found: %d", len(result.items))
         if args.teaching_content_json:
             out_path = Path(args.teaching_content_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(result.items, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            _write_json(out_path, result.items)
             logger.info("wrote teaching content json: %s", out_path)
-        for it in result.items[:10]:
-            if it.get("source") == "assignment":
-                logger.info(
-                    "assignment(in content): online=%s | %s | %s",
-                    it.get("is_online_submission", False),
-                    it.get("title", ""),
-                    it.get("url", ""),
-                )
-            else:
-                logger.info(
-                    "teaching_content: %s | attachments=%s | %s",
-                    it.get("title", ""),
-                    it.get("has_attachments", False),
-                    it.get("url", ""),
-                )
+        _log_items(result.items[:10], _log_teaching_content)
 
     if args.debug_assignments:
+        from app.bb import debug_dump_assignments
+
         if not args.course_query:
             logger.error("--course-query is required for --debug-assignments")
             return 2
-        result = asyncio.run(
-            debug_dump_assignments(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                course_query=args.course_query,
-                headless=config.headless,
-                portal_html_path=root / "data" / "debug_courses.html",
-                course_entry_html_path=root / "data" / "debug_course_entry.html",
-                assignments_html_path=root / "data" / "debug_assignments.html",
-            )
+        result = await debug_dump_assignments(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            course_query=args.course_query,
+            headless=config.headless,
+            portal_html_path=root / "data" / "debug_courses.html",
+            course_entry_html_path=root / "data" / "debug_course_entry.html",
+            assignments_html_path=root / "data" / "debug_assignments.html",
         )
         logger.info("debug assignments ok: %s (course_id=%s)", result.course.name, result.course.course_id)
         logger.info("course_entry_url: %s", result.course_entry_url)
@@ -513,37 +574,31 @@ def main(argv: list[str] | None = None) -> int:
         logger.info("assignments found: %d", len(result.items))
         if args.assignments_json:
             out_path = Path(args.assignments_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(result.items, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            _write_json(out_path, result.items)
             logger.info("wrote assignments json: %s", out_path)
-        for it in result.items[:15]:
-            logger.info(
-                "assignment: online=%s | %s | %s",
-                it.get("is_online_submission", False),
-                it.get("title", ""),
-                it.get("url", ""),
-            )
+        _log_items(result.items[:15], _log_assignment)
 
     if args.debug_assignment_samples:
+        from app.bb import debug_dump_assignment_samples
+
         if not args.course_query:
             logger.error("--course-query is required for --debug-assignment-samples")
             return 2
         if not args.submitted_assignment_query or not args.unsubmitted_assignment_query:
             logger.error("--submitted-assignment-query and --unsubmitted-assignment-query are required for --debug-assignment-samples")
             return 2
-        result = asyncio.run(
-            debug_dump_assignment_samples(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                course_query=args.course_query,
-                submitted_assignment_query=args.submitted_assignment_query,
-                unsubmitted_assignment_query=args.unsubmitted_assignment_query,
-                headless=config.headless,
-                assignments_html_path=root / "data" / "debug_assignments.html",
-                submitted_html_path=root / "data" / "debug_assignment_submitted.html",
-                submitted_new_attempt_html_path=root / "data" / "debug_assignment_submitted_new_attempt.html",
-                unsubmitted_html_path=root / "data" / "debug_assignment_unsubmitted.html",
-            )
+        result = await debug_dump_assignment_samples(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            course_query=args.course_query,
+            submitted_assignment_query=args.submitted_assignment_query,
+            unsubmitted_assignment_query=args.unsubmitted_assignment_query,
+            headless=config.headless,
+            portal_html_path=root / "data" / "debug_courses.html",
+            assignments_html_path=root / "data" / "debug_assignments.html",
+            submitted_html_path=root / "data" / "debug_assignment_submitted.html",
+            submitted_new_attempt_html_path=root / "data" / "debug_assignment_submitted_new_attempt.html",
+            unsubmitted_html_path=root / "data" / "debug_assignment_unsubmitted.html",
         )
         logger.info("assignment samples ok: %s (course_id=%s)", result.course.name, result.course.course_id)
         logger.info("assignments_url: %s", result.assignments_url)
@@ -571,19 +626,19 @@ def main(argv: list[str] | None = None) -> int:
         )
 
     if args.debug_grades:
+        from app.bb import debug_dump_grades
+
         if not args.course_query:
             logger.error("--course-query is required for --debug-grades")
             return 2
-        result = asyncio.run(
-            debug_dump_grades(
-                state_path=config.bb_state_path,
-                portal_url=config.bb_courses_url or config.bb_base_url,
-                course_query=args.course_query,
-                headless=config.headless,
-                portal_html_path=root / "data" / "debug_courses.html",
-                course_entry_html_path=root / "data" / "debug_course_entry.html",
-                grades_html_path=root / "data" / "debug_grades.html",
-            )
+        result = await debug_dump_grades(
+            state_path=config.bb_state_path,
+            portal_url=portal_url,
+            course_query=args.course_query,
+            headless=config.headless,
+            portal_html_path=root / "data" / "debug_courses.html",
+            course_entry_html_path=root / "data" / "debug_course_entry.html",
+            grades_html_path=root / "data" / "debug_grades.html",
         )
         logger.info("debug grades ok: %s (course_id=%s)", result.course.name, result.course.course_id)
         logger.info("course_entry_url: %s", result.course_entry_url)
@@ -591,23 +646,131 @@ def main(argv: list[str] | None = None) -> int:
         logger.info("grade items found: %d", len(result.grades))
         if args.grades_json:
             out_path = Path(args.grades_json)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            out_path.write_text(json.dumps(result.grades, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            _write_json(out_path, result.grades)
             logger.info("wrote grades json: %s", out_path)
-        for it in result.grades[:15]:
-            logger.info(
-                "grade_item: %s | cat=%s | due=%s | last=%s | grade=%s/%s",
-                it.get("title", ""),
-                it.get("category", ""),
-                it.get("duedate_display", "") or it.get("duedate", ""),
-                it.get("lastactivity", "") or it.get("lastactivity_display", ""),
-                it.get("grade_raw", ""),
-                it.get("points_possible_raw", ""),
-            )
+        _log_items(result.grades[:15], _log_grade)
 
     logger.info("done")
     return 0
 
 
+@functools.lru_cache(maxsize=None)
+def _build_parser() -> argparse.ArgumentParser:
+    # Built once per process (parse_args does not mutate the parser); main() may be called repeatedly.
+    # Flat flags rather than subcommands: check.sh and existing crontabs invoke `--run --limit N`.
+    parser = argparse.ArgumentParser(prog="pku-bb-watcher")
+
+    run = parser.add_argument_group("run")
+    run.add_argument("--run", action="store_true", help="Fetch all items and push Bark notifications (Step E).")
+    run.add_argument("--daemon", action="store_true", help="With --run: stay resident and repeat every --interval seconds.")
+    run.add_argument(
+        "--interval",
+        type=int,
+        help=f"Seconds between cycles for --run --daemon (default {_DEFAULT_INTERVAL_S}, minimum {_MIN_INTERVAL_S}).",
+    )
+    run.add_argument("--dry-run", action="store_true", help="Do not push; only log pending notifications.")
+    run.add_argument(
+        "--dry-run-out",
+        default="",
+        help="When used with --run --dry-run, write Bark message previews to this file (JSON).",
+    )
+    run.add_argument("--limit", type=int, default=0, help="Limit pushes for --run (0 = use POLL_LIMIT_PER_RUN).")
+
+    fetch = parser.add_argument_group("fetch")
+    fetch.add_argument("--fetch-all", action="store_true", help="Fetch all courses and all boards into unified Items.")
+    fetch.add_argument("--course-limit", type=int, default=0, help="Limit courses fetched for --fetch-all (0 = no limit).")
+    fetch.add_argument("--items-json", default="", help="Write unified Items to a JSON file (for --fetch-all).")
+
+    offline = parser.add_argument_group("offline parsing")
+    # Each --parse-* branch returns right away, so a second one would be silently ignored; let argparse reject it.
+    parse_one = offline.add_mutually_exclusive_group()
+    parse_one.add_argument("--parse-announcements-html", default="", help="Parse a saved announcements HTML file (offline).")
+    parse_one.add_argument("--parse-teaching-content-html", default="", help='Parse a saved "教学内容" HTML file (offline).')
+    parse_one.add_argument("--parse-assignments-html", default="", help='Parse a saved "课程作业" HTML file (offline).')
+    parse_one.add_argument("--parse-grades-html", default="", help='Parse a saved "个人成绩" HTML file (offline).')
+    offline.add_argument("--announcements-json", default="", help="Write parsed announcements to a JSON file.")
+    offline.add_argument("--teaching-content-json", default="", help='Write parsed "教学内容" items to a JSON file.')
+    offline.add_argument("--assignments-json", default="", help='Write parsed "课程作业" items to a JSON file.')
+    offline.add_argument("--grades-json", default="", help='Write parsed "个人成绩" items to a JSON file.')
+
+    debug = parser.add_argument_group("debug")
+    debug.add_argument("--check-login", action="store_true", help="Open a page using storage_state and log title/url.")
+    debug.add_argument("--list-courses", action="store_true", help="Dump portal HTML and extract student courses.")
+    debug.add_argument("--debug-announcements", action="store_true", help="Dump HTML for one course announcements page.")
+    debug.add_argument("--debug-teaching-content", action="store_true", help='Dump HTML for one course "教学内容" page.')
+    debug.add_argument("--debug-assignments", action="store_true", help='Dump HTML for one course "课程作业" page.')
+    debug.add_argument(
+        "--debug-assignment-samples",
+        action="store_true",
+        help='Dump two assignment detail HTML pages (submitted/unsubmitted samples) for one course.',
+    )
+    debug.add_argument("--debug-grades", action="store_true", help='Dump HTML for one course "个人成绩" page.')
+    debug.add_argument("--course-query", default="", help="Substring to match the target course in portal list.")
+    debug.add_argument("--submitted-assignment-query", default="", help="Substring to match the submitted assignment title.")
+    debug.add_argument("--unsubmitted-assignment-query", default="", help="Substring to match the unsubmitted assignment title.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    # Flag checks need neither config nor the log file; a rejected command line leaves both untouched
+    # (errors go to stderr through logging's last-resort handler).
+    for arg, deps in _REQUIRES:
+        if getattr(args, arg) and not any(getattr(args, d) for d in deps):
+            logger.error("%s must be used with %s", _flag(arg), " or ".join(_flag(d) for d in deps))
+            return 2
+    if args.dry_run_out and not (args.run and args.dry_run):
+        logger.error("--dry-run-out must be used with --run --dry-run")
+        return 2
+    if args.interval is not None and args.interval < _MIN_INTERVAL_S:
+        logger.error("--interval must be at least %d seconds", _MIN_INTERVAL_S)
+        return 2
+    if args.interval is None:
+        args.interval = _DEFAULT_INTERVAL_S
+
+    root = _PROJECT_ROOT
+    config = load_config(root)
+    setup_logging(config.log_path)
+
+    logger.info("config loaded")
+    # Only --run touches the DB; offline parsing and browser-only commands skip opening it.
+    if args.run:
+        from app.store import init_db
+
+        init_db(config.db_path)
+        logger.info("db init ok: %s", config.db_path)
+
+    for html_dest, json_dest, fn_name, label, head, log_item in _PARSE_DISPATCH:
+        if getattr(args, html_dest):
+            import app.bb
+
+            html_path = Path(getattr(args, html_dest))
+            items = getattr(app.bb, fn_name)(html=html_path.read_bytes(), base_url=config.bb_base_url)
+            logger.info("parsed %s from %s: %d", label, html_path, len(items))
+            if getattr(args, json_dest):
+                out_path = Path(getattr(args, json_dest))
+                _write_json(out_path, items)
+                logger.info("wrote %s json: %s", label, out_path)
+            _log_items(items[:head], log_item)
+            logger.info("done")
+            return 0
+
+    import asyncio
+
+    rc = asyncio.run(_run_online(args, config, root))
+    if rc is not None:
+        return rc
+    from app.store import close_all
+
+    try:
+        if args.daemon:
+            return _run_daemon(args, config, root)
+        return _run_once(args, config, root)
+    finally:
+        close_all()
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -2,11 +2,18 @@ from __future__ import annotations
 
 import hashlib
 import json
-from dataclasses import dataclass
-from typing import Any, Optional
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
 
+# Same output as json.dumps(..., ensure_ascii=False, sort_keys=True), minus building an encoder per call
+# (json.dumps only caches its default-argument encoder). Fingerprints are DB keys: the bytes must not change.
+_encode_sorted = json.JSONEncoder(ensure_ascii=False, sort_keys=True).encode
 
-@dataclass(frozen=True)
+
+_STRIPPED_FIELDS = ("source", "course_id", "course_name", "title", "url", "due", "ts", "external_id")
+
+
+@dataclass(frozen=True, slots=True)
 class Item:
     source: str
     course_id: str
@@ -17,6 +24,18 @@ class Item:
     ts: Optional[str] = None
     external_id: Optional[str] = None
     raw: dict[str, Any] | None = None
+    # Memoized identity_fp()/state_fp(); the dataclass is frozen, so they are filled via object.__setattr__.
+    # `raw` is treated as immutable once wrapped in an Item (fetchers finish editing the dict before building it).
+    _identity_fp: str = field(default="", init=False, repr=False, compare=False)
+    _state_fp: str = field(default="", init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Trim the text fields once here so the fingerprint methods can use them as-is. `raw` is left
+        # untouched: its values feed state_fp verbatim.
+        for name in _STRIPPED_FIELDS:
+            v = getattr(self, name)
+            if isinstance(v, str) and v != (stripped := v.strip()):
+                object.__setattr__(self, name, stripped)
 
     def identity_fp(self) -> str:
         """
@@ -28,13 +47,15 @@ class Item:
         - url (stable detail link or history link) as fallback
         - title as last resort
         """
+        if self._identity_fp:
+            return self._identity_fp
         payload: dict[str, str] = {
-            "source": (self.source or "").strip(),
-            "course_id": (self.course_id or "").strip(),
+            "source": self.source or "",
+            "course_id": self.course_id or "",
         }
-        external_id = (self.external_id or "").strip()
-        url = (self.url or "").strip()
-        title = (self.title or "").strip()
+        external_id = self.external_id or ""
+        url = self.url or ""
+        title = self.title or ""
 
         if external_id:
             payload["external_id"] = external_id
@@ -43,22 +64,26 @@ class Item:
         else:
             payload["title"] = title
 
-        blob = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
-        return hashlib.sha1(blob).hexdigest()
+        blob = _encode_sorted(payload).encode("utf-8")
+        fp = hashlib.sha1(blob).hexdigest()
+        object.__setattr__(self, "_identity_fp", fp)
+        return fp
 
     def state_fp(self) -> str:
         """
         Hash of the current item state (used to detect updates on the same identity).
         """
+        if self._state_fp:
+            return self._state_fp
         raw = self.raw or {}
-        source = (self.source or "").strip()
+        source = self.source or ""
 
         state: dict[str, Any] = {
             "id": self.identity_fp(),
-            "title": (self.title or "").strip(),
-            "url": (self.url or "").strip(),
-            "due": (self.due or "").strip(),
-            "ts": (self.ts or "").strip(),
+            "title": self.title or "",
+            "url": self.url or "",
+            "due": self.due or "",
+            "ts": self.ts or "",
         }
 
         if source == "announcement":
@@ -81,8 +106,23 @@ class Item:
             state["grade_raw"] = raw.get("grade_raw", "")
             state["points_possible_raw"] = raw.get("points_possible_raw", "")
 
-        blob = json.dumps(state, ensure_ascii=False, sort_keys=True).encode("utf-8")
-        return hashlib.sha1(blob).hexdigest()
+        blob = _encode_sorted(state).encode("utf-8")
+        fp = hashlib.sha1(blob).hexdigest()
+        object.__setattr__(self, "_state_fp", fp)
+        return fp
+
+    @classmethod
+    def fingerprint_many(cls, items: Iterable[Item]) -> tuple[list[str], list[str]]:
+        """
+        (identity_fps, state_fps) for `items`, in order, computed in one pass.
+        """
+        ids: list[str] = []
+        states: list[str] = []
+        add_id, add_state = ids.append, states.append
+        for it in items:
+            add_id(it.identity_fp())
+            add_state(it.state_fp())
+        return ids, states
 
     def fingerprint(self) -> str:
         # Backward-compatible alias: fp is the identity key.
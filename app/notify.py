@@ -1,10 +1,45 @@
 from __future__ import annotations
 
+import functools
 import logging
+import re
+import threading
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+_TZ_CN = timezone(timedelta(hours=8))
+
+# simplify_course_name
+_RE_COURSE_CODE = re.compile(r"[0-9\-\*]{6,}")
+_RE_COURSE_TERM = re.compile(r"\([^)]*(?:学期|学年)[^)]*\)\s*$")
+
+# humanize_time
+_RE_CN_DT = re.compile(
+    r"^(?P<y>\d{4})年(?P<m>\d{1,2})月(?P<d>\d{1,2})日"
+    r"(?:\s*星期[一二三四五六日天])?"
+    r"(?:\s+(?P<ampm>上午|下午|中午|晚上))?"
+    r"(?:\s*(?P<h>\d{1,2})(?:时|:)(?P<mi>\d{1,2})(?:分|:)??(?P<s>\d{1,2})?(?:秒)?)?"
+    r"(?:\s+(?P<tz>[A-Za-z]{2,5}))?$"
+)
+_RE_DASH_DATE = re.compile(
+    r"^(?P<y>\d{4}|\d{2})-(?P<m>\d{1,2})-(?P<d>\d{1,2})"
+    r"(?:\s+(?P<ampm>上午|下午)?(?P<h>\d{1,2}):(?P<mi>\d{2}))?$"
+)
+
+
+def _squash_ws(text: str) -> str:
+    """
+    Collapse whitespace runs to single spaces and strip (" ".join(text.split())).
+    Most fields are already clean (printable, no double spaces), so those are only stripped.
+    """
+    if text.isprintable() and "  " not in text:
+        return text.strip()
+    return " ".join(text.split())
+
 
 @dataclass(frozen=True)
 class BarkMessage:
@@ -13,6 +48,15 @@ class BarkMessage:
     url: str = ""
 
 
+def _first(d: dict, *keys: str) -> Any:
+    """First truthy value among `d[key]` for `keys`, else "" (same as `d.get(a) or d.get(b) or ""`)."""
+    for k in keys:
+        v = d.get(k)
+        if v:
+            return v
+    return ""
+
+
 def simplify_course_name(name: str) -> str:
     """
     Convert portal display names like:
@@ -20,8 +64,6 @@ def simplify_course_name(name: str) -> str:
     into:
       "信息学中的概率统计"
     """
-    import re
-
     s = " ".join((name or "").split()).strip()
     if not s:
         return ""
@@ -29,53 +71,81 @@ def simplify_course_name(name: str) -> str:
     # Drop leading numeric/code prefix like "25261-...: ".
     if ":" in s:
         prefix, rest = s.split(":", 1)
-        if re.search(r"[0-9\-\*]{6,}", prefix):
+        if _RE_COURSE_CODE.search(prefix):
             s = rest.strip()
 
     # Drop trailing term suffix like "(25-26学年第1学期)".
-    s = re.sub(r"\([^)]*(?:学期|学年)[^)]*\)\s*$", "", s).strip()
+    s = _RE_COURSE_TERM.sub("", s).strip()
     return s
 
 
-def send_bark(*, endpoint: str, title: str, body: str, url: str = "", timeout_s: int = 10) -> None:
-    """
-    Send a Bark push.
+# Shared HTTP session: pushes in one run reuse the keep-alive TLS connection to the Bark server.
+_session = None
+_session_lock = threading.Lock()
 
-    `endpoint` should look like: https://api.day.app/<token>
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+            _session = session
+        return _session
+
+
+# Byte -> percent-escape table matching quote(s, safe=""): only RFC 3986 unreserved bytes pass through.
+_QUOTE_LUT = tuple(
+    chr(i) if (48 <= i <= 57 or 65 <= i <= 90 or 97 <= i <= 122 or i in b"-._~") else f"%{i:02X}" for i in range(256)
+)
+
+
+def _quote_segment(text: str) -> str:
+    """Percent-encode a URL path segment; same output as quote(text, safe="")."""
+    return "".join([_QUOTE_LUT[b] for b in text.encode("utf-8")])
+
+
+@functools.lru_cache(maxsize=8)
+def _bark_base(endpoint: str) -> str:
+    """
+    Normalize and validate BARK_ENDPOINT into the push URL prefix (no trailing slash).
+    Cached: every push of a run uses the same endpoint. Invalid values raise and are not cached.
     """
-    endpoint = (endpoint or "").strip()
     if not endpoint:
         raise ValueError("BARK_ENDPOINT is empty.")
-
-    import requests
-    from urllib.parse import quote
-    from urllib.parse import urlparse
-
-    def normalize_endpoint(ep: str) -> str:
-        ep = (ep or "").strip().rstrip("/")
-        if not ep:
-            return ""
-        # Accept token-only form: "<token>"
-        if "://" not in ep:
-            if "/" not in ep:
-                return f"https://api.day.app/{ep}"
+    ep = endpoint.rstrip("/")
+    # Accept token-only form: "<token>"
+    if ep and "://" not in ep:
+        if "/" not in ep:
+            ep = f"https://api.day.app/{ep}"
+        else:
             # Accept host/path without scheme: "api.day.app/<token>"
-            return f"https://{ep}"
-        return ep
-
-    endpoint = normalize_endpoint(endpoint)
-    parsed = urlparse(endpoint)
+            ep = f"https://{ep}"
+    parsed = urlparse(ep)
     if not parsed.scheme or not parsed.netloc:
         raise ValueError("Invalid BARK_ENDPOINT; use https://api.day.app/<token> or just <token>.")
+    return ep.rstrip("/")
+
+
+def send_bark(*, endpoint: str, title: str, body: str, url: str = "", timeout_s: int = 10) -> None:
+    """
+    Send a Bark push.
+
+    `endpoint` should look like: https://api.day.app/<token>
+    """
+    base = _bark_base((endpoint or "").strip())
 
     # Bark uses path segments; encode them safely.
-    push_url = endpoint.rstrip("/") + "/" + quote(title, safe="") + "/" + quote(body, safe="")
+    push_url = base + "/" + _quote_segment(title) + "/" + _quote_segment(body)
     # User preference: do not include clickable URL in pushes (many clients won't open it anyway).
     # Keep the function signature for compatibility, but ignore `url`.
-    params = {}
 
+    session = _get_session()
     try:
-        resp = requests.get(push_url, params=params, timeout=timeout_s)
+        resp = session.get(push_url, timeout=timeout_s)
     except Exception:
         # Avoid leaking token in exception messages.
         raise RuntimeError("bark request failed") from None
@@ -83,8 +153,32 @@ def send_bark(*, endpoint: str, title: str, body: str, url: str = "", timeout_s:
         raise RuntimeError(f"bark http {resp.status_code}")
 
 
+def send_bark_many(*, endpoint: str, messages: list[BarkMessage], timeout_s: int = 10, max_workers: int = 4) -> list[Exception | None]:
+    """
+    Send several Bark pushes concurrently (at most `max_workers` in flight, over the shared session).
+
+    Returns one entry per message, in order: None if it was sent, else the exception `send_bark` raised,
+    so one failing push neither stops the others nor hides which ones went out.
+    """
+
+    def push(msg: BarkMessage) -> Exception | None:
+        try:
+            send_bark(endpoint=endpoint, title=msg.title, body=msg.body, timeout_s=timeout_s)
+        except Exception as e:
+            return e
+        return None
+
+    if len(messages) <= 1:
+        return [push(msg) for msg in messages]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(messages))) as pool:
+        return list(pool.map(push, messages))
+
+
 def _excerpt(text: str, limit: int = 160) -> str:
-    s = " ".join((text or "").split()).strip()
+    s = _squash_ws(text or "")
     if len(s) <= limit:
         return s
     return s[: limit - 1] + "…"
@@ -98,15 +192,15 @@ def humanize_time(raw: str) -> str:
       2025-11-7 下午11:06 -> 2025年11月7号 23:06:00
     Falls back to original string if parsing fails.
     """
-    import re
-    from datetime import datetime, timedelta, timezone
-
-    s = " ".join((raw or "").split()).strip()
+    s = _squash_ws(raw or "")
     if not s or s in {"-", "—"}:
         return ""
+    # Every supported format starts with the year; skip the parsers for display text like "已批改".
+    if not s[0].isdigit():
+        return s
 
     def fmt_dt(dt: datetime) -> str:
-        dt8 = dt.astimezone(timezone(timedelta(hours=8))) if dt.tzinfo else dt.replace(tzinfo=timezone(timedelta(hours=8)))
+        dt8 = dt.astimezone(_TZ_CN) if dt.tzinfo else dt.replace(tzinfo=_TZ_CN)
         return f"{dt8.year}年{dt8.month}月{dt8.day}日 {dt8.hour:02}:{dt8.minute:02}:{dt8.second:02}"
 
     # ISO-8601 datetime
@@ -118,21 +212,14 @@ def humanize_time(raw: str) -> str:
         pass
 
     # CN datetime: "YYYY年M月D日 星期X 下午H:MM(:SS)?" or "YYYY年M月D日 下午H时MM分SS秒"
-    m = re.match(
-        r"^(?P<y>\d{4})年(?P<m>\d{1,2})月(?P<d>\d{1,2})日"
-        r"(?:\s*星期[一二三四五六日天])?"
-        r"(?:\s+(?P<ampm>上午|下午|中午|晚上))?"
-        r"(?:\s*(?P<h>\d{1,2})(?:时|:)(?P<mi>\d{1,2})(?:分|:)??(?P<s>\d{1,2})?(?:秒)?)?"
-        r"(?:\s+(?P<tz>[A-Za-z]{2,5}))?$",
-        s,
-    )
+    m = _RE_CN_DT.match(s) if "年" in s else None
     if m:
-        y, mo, d = int(m.group("y")), int(m.group("m")), int(m.group("d"))
-        if not m.group("h"):
+        ys, mos, ds, hs, mis, secs, ampm = m.group("y", "m", "d", "h", "mi", "s", "ampm")
+        y, mo, d = int(ys), int(mos), int(ds)
+        if not hs:
             return f"{y}年{mo}月{d}日"
-        h, mi = int(m.group("h")), int(m.group("mi"))
-        sec = int(m.group("s") or 0)
-        ampm = (m.group("ampm") or "").strip()
+        h, mi, sec = int(hs), int(mis), int(secs or 0)
+        ampm = (ampm or "").strip()
         if ampm in {"下午", "晚上"} and h < 12:
             h += 12
         elif ampm == "上午" and h == 12:
@@ -141,36 +228,24 @@ def humanize_time(raw: str) -> str:
             h += 12
         return f"{y}年{mo}月{d}日 {h:02}:{mi:02}:{sec:02}"
 
-    # ISO date only
-    m = re.match(r"^(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})$", s)
-    if m:
-        y, mo, d = int(m.group("y")), int(m.group("m")), int(m.group("d"))
-        return f"{y}年{mo}月{d}日"
-
-    # Blackboard CN display: "YYYY-M-D 下午H:MM" or "YYYY-M-D 上午H:MM"
-    m = re.match(r"^(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})\s+(?P<ampm>上午|下午)?(?P<h>\d{1,2}):(?P<mi>\d{2})$", s)
+    # Dash dates, one pass for all three shapes:
+    #   "YYYY-M-D" (ISO date only), "YYYY-M-D 下午H:MM" (Blackboard CN display),
+    #   "YY-M-D 下午H:MM" (attempt stamp, assume 2000+YY; only ever seen with a time).
+    m = _RE_DASH_DATE.match(s)
     if m:
-        y, mo, d = int(m.group("y")), int(m.group("m")), int(m.group("d"))
-        h, mi = int(m.group("h")), int(m.group("mi"))
-        ampm = (m.group("ampm") or "").strip()
-        if ampm == "下午" and h < 12:
-            h += 12
-        if ampm == "上午" and h == 12:
-            h = 0
-        return f"{y}年{mo}月{d}日 {h:02}:{mi:02}:00"
-
-    # Attempt stamp: "YY-M-D 下午H:MM" (assume 2000+YY)
-    m = re.match(r"^(?P<yy>\d{2})-(?P<m>\d{1,2})-(?P<d>\d{1,2})\s+(?P<ampm>上午|下午)?(?P<h>\d{1,2}):(?P<mi>\d{2})$", s)
-    if m:
-        y = 2000 + int(m.group("yy"))
-        mo, d = int(m.group("m")), int(m.group("d"))
-        h, mi = int(m.group("h")), int(m.group("mi"))
-        ampm = (m.group("ampm") or "").strip()
-        if ampm == "下午" and h < 12:
-            h += 12
-        if ampm == "上午" and h == 12:
-            h = 0
-        return f"{y}年{mo}月{d}日 {h:02}:{mi:02}:00"
+        ys, mos, ds, hs, mis, ampm = m.group("y", "m", "d", "h", "mi", "ampm")
+        if hs or len(ys) == 4:
+            y, mo, d = int(ys), int(mos), int(ds)
+            if len(ys) == 2:
+                y += 2000
+            if not hs:
+                return f"{y}年{mo}月{d}日"
+            h, mi = int(hs), int(mis)
+            if ampm == "下午" and h < 12:
+                h += 12
+            if ampm == "上午" and h == 12:
+                h = 0
+            return f"{y}年{mo}月{d}日 {h:02}:{mi:02}:00"
 
     return s
 
@@ -199,16 +274,18 @@ def message_for_new_item(item: dict) -> BarkMessage | None:
     raw = item.get("raw") or {}
 
     if source == "announcement":
-        published = raw.get("published_at") or raw.get("published_at_raw") or ""
+        published = _first(raw, "published_at", "published_at_raw")
         author = raw.get("author", "") or ""
         content = _excerpt(raw.get("content", "") or "", 180)
-        lines = []
-        if published:
-            lines.append(f"发布时间: {humanize_time(published) or published}")
-        if author:
-            lines.append(f"发帖者: {author}")
-        if content:
-            lines.append(f"内容: {content}")
+        lines = [
+            f"{label}: {value}"
+            for label, value in (
+                ("发布时间", published and (humanize_time(published) or published)),
+                ("发帖者", author),
+                ("内容", content),
+            )
+            if value
+        ]
         return build_bark_message(kind="新通知", course_name=course_name, item_title=title, url=url, lines=lines)
 
     if source == "teaching_content":
@@ -222,7 +299,7 @@ def message_for_new_item(item: dict) -> BarkMessage | None:
     if source == "assignment":
         online = bool(raw.get("is_online_submission", False))
         lines: list[str] = []
-        due = raw.get("due_at") or raw.get("due_at_raw") or ""
+        due = _first(raw, "due_at", "due_at_raw")
         if online:
             if due:
                 lines.append(f"到期: {humanize_time(due) or due}")
@@ -241,31 +318,53 @@ def message_for_new_item(item: dict) -> BarkMessage | None:
         cat = raw.get("category", "") or ""
         grade_raw = (raw.get("grade_raw") or "").strip()
         points_raw = (raw.get("points_possible_raw") or "").strip()
-        due = raw.get("duedate_display") or raw.get("duedate") or ""
-        last = raw.get("lastactivity") or raw.get("lastactivity_display") or ""
-        lines = []
-        if cat:
-            lines.append(f"类别: {cat}")
-        if grade_raw or points_raw:
-            lines.append(f"成绩: {grade_raw}/{points_raw}".rstrip("/"))
-        if due:
-            lines.append(f"到期: {humanize_time(due) or due}")
-        if last:
-            lines.append(f"评分时间: {humanize_time(last) or last}")
+        due = _first(raw, "duedate_display", "duedate")
+        last = _first(raw, "lastactivity", "lastactivity_display")
+        lines = [
+            f"{label}: {value}"
+            for label, value in (
+                ("类别", cat),
+                ("成绩", f"{grade_raw}/{points_raw}".rstrip("/")),
+                ("到期", due and (humanize_time(due) or due)),
+                ("评分时间", last and (humanize_time(last) or last)),
+            )
+            if value
+        ]
         return build_bark_message(kind="新成绩项", course_name=course_name, item_title=title, url=url, lines=lines)
 
     return None
 
 
+# Raw keys message_for_updated_item reads, per source; if none of them changed there is nothing to report.
+_UPDATE_FIELDS: dict[str, tuple[str, ...]] = {
+    "grade_item": ("category", "grade_raw", "points_possible_raw", "duedate_display", "duedate", "status"),
+    "assignment": (
+        "url",
+        "submission_url",
+        "is_online_submission",
+        "due_at",
+        "due_at_raw",
+        "points_possible_raw",
+        "grade_raw",
+        "submitted",
+        "submitted_at_raw",
+    ),
+}
+
+
 def message_for_updated_item(*, new_item: dict, old_raw: dict) -> BarkMessage | None:
     source = (new_item.get("source") or "").strip()
+    new_raw = new_item.get("raw") or {}
+    fields = _UPDATE_FIELDS.get(source)
+    if fields is None or all(old_raw.get(k) == new_raw.get(k) for k in fields):
+        return None
+
     course_name = (new_item.get("course_name") or "").strip()
     title = (new_item.get("title") or "").strip()
     url = (new_item.get("url") or "").strip()
-    new_raw = new_item.get("raw") or {}
 
     def s(v) -> str:
-        return " ".join(str(v or "").split()).strip()
+        return _squash_ws(str(v or ""))
 
     if source == "grade_item":
         cat = s(new_raw.get("category", ""))
@@ -273,27 +372,30 @@ def message_for_updated_item(*, new_item: dict, old_raw: dict) -> BarkMessage |
         old_grade = s(old_raw.get("grade_raw", ""))
         new_points = s(new_raw.get("points_possible_raw", ""))
         old_points = s(old_raw.get("points_possible_raw", ""))
-        new_due = s(new_raw.get("duedate_display") or new_raw.get("duedate") or "")
-        old_due = s(old_raw.get("duedate_display") or old_raw.get("duedate") or "")
+        new_due = s(_first(new_raw, "duedate_display", "duedate"))
+        old_due = s(_first(old_raw, "duedate_display", "duedate"))
         new_status = s(new_raw.get("status", ""))
         old_status = s(old_raw.get("status", ""))
+        old_cat = s(old_raw.get("category", ""))
 
         def is_missing_grade(g: str) -> bool:
             return not g or g in {"-", "—"}
 
         # Category-aware naming: assignments vs general grade items.
-        is_assignment_grade = (cat == "作业") or (s(old_raw.get("category", "")) == "作业")
+        is_assignment_grade = (cat == "作业") or (old_cat == "作业")
 
         if is_missing_grade(old_grade) and not is_missing_grade(new_grade):
             kind = "作业出分" if is_assignment_grade else "成绩出分"
-            lines = []
-            if cat:
-                lines.append(f"类别: {cat}")
-            lines.append(f"成绩: {new_grade}/{new_points}".rstrip("/"))
-            if new_due:
-                lines.append(f"到期: {humanize_time(new_due) or new_due}")
-            if new_status:
-                lines.append(f"状态: {new_status}")
+            lines = [
+                f"{label}: {value}"
+                for label, value in (
+                    ("类别", cat),
+                    ("成绩", f"{new_grade}/{new_points}".rstrip("/")),
+                    ("到期", new_due and (humanize_time(new_due) or new_due)),
+                    ("状态", new_status),
+                )
+                if value
+            ]
             return build_bark_message(kind=kind, course_name=course_name, item_title=title, url=url, lines=lines)
 
         if old_grade != new_grade:
@@ -317,7 +419,6 @@ def message_for_updated_item(*, new_item: dict, old_raw: dict) -> BarkMessage |
             diffs.append(f"到期: {(humanize_time(old_due) or old_due)} -> {(humanize_time(new_due) or new_due)}".strip())
         if old_status != new_status:
             diffs.append(f"状态: {old_status} -> {new_status}".strip())
-        old_cat = s(old_raw.get("category", ""))
         if old_cat != cat:
             diffs.append(f"类别: {old_cat} -> {cat}".strip())
         if diffs:
@@ -331,8 +432,8 @@ def message_for_updated_item(*, new_item: dict, old_raw: dict) -> BarkMessage |
         old_online = bool(old_raw.get("is_online_submission", False))
         new_online = bool(new_raw.get("is_online_submission", False))
 
-        old_due = s(old_raw.get("due_at") or old_raw.get("due_at_raw") or "")
-        new_due = s(new_raw.get("due_at") or new_raw.get("due_at_raw") or "")
+        old_due = s(_first(old_raw, "due_at", "due_at_raw"))
+        new_due = s(_first(new_raw, "due_at", "due_at_raw"))
         old_points = s(old_raw.get("points_possible_raw") or "")
         new_points = s(new_raw.get("points_possible_raw") or "")
         old_grade = s(old_raw.get("grade_raw") or "")
@@ -2,15 +2,87 @@ from __future__ import annotations
 
 import json
 import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import cached_property
 from pathlib import Path
+from typing import Iterator
 
 from app.models import Item
 
+try:
+    import orjson
+except ImportError:  # optional speedup (see README); stdlib json is used instead
+    orjson = None
 
-def init_db(db_path: Path) -> None:
+
+def _dump_raw(raw: dict) -> str:
+    """Serialize Item.raw for the raw_json column (sorted keys, non-ASCII kept as-is)."""
+    if orjson is not None:
+        return orjson.dumps(raw, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(raw, ensure_ascii=False, sort_keys=True)
+
+
+_load_raw = orjson.loads if orjson is not None else json.loads
+
+
+# One connection per DB file for the life of the process (the daemon reuses it across cycles):
+# PRAGMAs and the schema check run once at open instead of on every store call.
+_CONN_CACHE: dict[Path, sqlite3.Connection] = {}
+# Whether this SQLite has json_each() (built in since 3.38, optional JSON1 before); probed on first open.
+_HAS_JSON_EACH: bool | None = None
+# UPDATE ... FROM needs SQLite 3.33+.
+_HAS_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
+
+
+def _get_conn(db_path: Path) -> sqlite3.Connection:
+    """
+    The cached connection for `db_path`, opened (and schema-checked) on first use.
+
+    It runs in autocommit mode (isolation_level=None): reads need no transaction, and writes go
+    through `connect()`, which wraps them in an explicit BEGIN IMMEDIATE.
+    """
+    global _HAS_JSON_EACH
+    conn = _CONN_CACHE.get(db_path)
+    if conn is not None:
+        return conn
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(db_path) as conn:
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if _HAS_JSON_EACH is None:
+            try:
+                conn.execute("SELECT value FROM json_each('[]')").fetchall()
+                _HAS_JSON_EACH = True
+            except sqlite3.OperationalError:
+                _HAS_JSON_EACH = False
+        # WAL is persistent on the DB file: readers don't block the single writer and commits fsync less.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")
+        conn.execute("PRAGMA mmap_size=268435456")
+        _ensure_schema(conn)
+    except BaseException:
+        conn.close()
+        raise
+    _CONN_CACHE[db_path] = conn
+    return conn
+
+
+# Schema revision stamped into PRAGMA user_version once _ensure_schema has brought a DB up to date.
+# Bump it whenever _ensure_schema changes.
+_SCHEMA_VERSION = 1
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    """
+    Create/migrate the items table and its indexes, unless the DB is already at _SCHEMA_VERSION
+    (then this is a single PRAGMA read: no table_info scans on a normal start).
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] == _SCHEMA_VERSION:
+        return
+    with _transaction(conn):
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS items (
@@ -33,7 +105,72 @@ def init_db(db_path: Path) -> None:
             """
         )
         _migrate_items_table(conn)
-        conn.commit()
+        # Partial index: the notified-rows count scans only notified rows. Covering index: fp lookups
+        # that read state_fp/sent_state_fp (fetch_state) are answered from the index alone.
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_items_sent_partial ON items(sent_state_fp) "
+            "WHERE sent_state_fp IS NOT NULL AND sent_state_fp!=''"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_items_state ON items(fp, state_fp, sent_state_fp)")
+        conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+
+
+def optimize(db_path: Path) -> None:
+    """Refresh planner stats where useful (call after a run's writes, outside any transaction)."""
+    # Without stats SQLite prefers the PK over idx_items_state, so don't wait for shutdown to gather them.
+    _get_conn(db_path).execute("PRAGMA optimize")
+
+
+def close_db(db_path: Path) -> None:
+    """Close and forget the cached connection for `db_path`, if any."""
+    conn = _CONN_CACHE.pop(db_path, None)
+    if conn is None:
+        return
+    try:
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+
+def close_all() -> None:
+    """Close every cached connection (call at shutdown)."""
+    while _CONN_CACHE:
+        close_db(next(iter(_CONN_CACHE)))
+
+
+def init_db(db_path: Path) -> None:
+    _get_conn(db_path)
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """
+    BEGIN IMMEDIATE ... COMMIT around the block, unless `conn` is already inside a transaction
+    (then the block simply joins it). Rolls back on error.
+    """
+    if conn.in_transaction:
+        yield
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+@contextmanager
+def connect(db_path: Path) -> Iterator[sqlite3.Connection]:
+    """
+    Run a batch of writes (upsert_seen/ack_state/mark_notified/mark_sent) on the cached connection.
+
+    Everything done through the yielded connection runs in one BEGIN IMMEDIATE transaction,
+    committed on normal exit and rolled back on error (one fsync per batch instead of per call).
+    """
+    conn = _get_conn(db_path)
+    with _transaction(conn):
+        yield conn
 
 
 def get_notification_counts(db_path: Path) -> tuple[int, int]:
@@ -41,12 +178,10 @@ def get_notification_counts(db_path: Path) -> tuple[int, int]:
     Returns (total_rows, notified_rows).
     notified_rows are rows with non-empty sent_state_fp.
     """
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
-        total = int(conn.execute("SELECT COUNT(1) FROM items").fetchone()[0])
-        notified = int(conn.execute("SELECT COUNT(1) FROM items WHERE sent_state_fp IS NOT NULL AND sent_state_fp!=''").fetchone()[0])
-        return total, notified
+    conn = _get_conn(db_path)
+    total = int(conn.execute("SELECT COUNT(1) FROM items").fetchone()[0])
+    notified = int(conn.execute("SELECT COUNT(1) FROM items WHERE sent_state_fp IS NOT NULL AND sent_state_fp!=''").fetchone()[0])
+    return total, notified
 
 
 def _migrate_items_table(conn: sqlite3.Connection) -> None:
@@ -55,11 +190,12 @@ def _migrate_items_table(conn: sqlite3.Connection) -> None:
     if "course" in cols and "course_name" not in cols:
         conn.execute("ALTER TABLE items ADD COLUMN course_name TEXT")
         conn.execute("UPDATE items SET course_name=course WHERE (course_name IS NULL OR course_name='') AND course IS NOT NULL AND course!=''")
+        cols.add("course_name")
     for col in ["course_id", "course_name", "external_id", "state_fp", "sent_state_fp", "updated_at"]:
         if col not in cols:
             conn.execute(f"ALTER TABLE items ADD COLUMN {col} TEXT")
+            cols.add(col)
     # Backfill: if previously sent but no sent_state_fp recorded, treat current state_fp as last notified.
-    cols = {row[1] for row in conn.execute("PRAGMA table_info(items)").fetchall()}
     if "sent_state_fp" in cols and "state_fp" in cols and "sent_at" in cols:
         conn.execute(
             "UPDATE items SET sent_state_fp=state_fp "
@@ -68,7 +204,28 @@ def _migrate_items_table(conn: sqlite3.Connection) -> None:
 
 
 def _now_iso() -> str:
-    return datetime.now(tz=timezone.utc).isoformat()
+    # Second precision: microseconds only made every timestamp cell 7 bytes longer.
+    return datetime.now(tz=timezone.utc).isoformat(timespec="seconds")
+
+
+# SQLite builds before 3.32 cap bound parameters at 999; stay below that.
+_IN_CHUNK = 900
+
+
+def _select_in(conn: sqlite3.Connection, sql: str, fps: list[str]) -> Iterator[tuple]:
+    """
+    Run `sql` (one "{}" slot for the IN-list) over `fps`.
+
+    With json_each() the whole list goes in as one JSON parameter: a single statement, no
+    parameter-count limit. Otherwise fall back to chunks of _IN_CHUNK placeholders; all full chunks
+    share the same SQL text, so sqlite3's statement cache reuses one prepared statement.
+    """
+    if _HAS_JSON_EACH:
+        yield from conn.execute(sql.format("SELECT value FROM json_each(?)"), (json.dumps(fps),))
+        return
+    for i in range(0, len(fps), _IN_CHUNK):
+        chunk = fps[i : i + _IN_CHUNK]
+        yield from conn.execute(sql.format(",".join("?" * len(chunk))), chunk)
 
 
 def bulk_filter_new(db_path: Path, items: list[Item]) -> list[Item]:
@@ -80,51 +237,59 @@ def bulk_filter_new(db_path: Path, items: list[Item]) -> list[Item]:
     if not items:
         return []
     fps = [it.identity_fp() for it in items]
-    existing: set[str] = set()
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
-        # SQLite has a parameter limit; chunk to stay safe.
-        chunk_size = 900
-        for i in range(0, len(fps), chunk_size):
-            chunk = fps[i : i + chunk_size]
-            q = ",".join("?" for _ in chunk)
-            rows = conn.execute(f"SELECT fp FROM items WHERE fp IN ({q})", chunk).fetchall()
-            existing.update(r[0] for r in rows)
-    return [it for it in items if it.identity_fp() not in existing]
+    conn = _get_conn(db_path)
+    if _HAS_JSON_EACH:
+        # Let SQLite compute the difference: only the missing fps come back (one PK probe each).
+        # NOT EXISTS rather than EXCEPT, which would scan the whole fp index.
+        missing = {
+            r[0]
+            for r in conn.execute(
+                "SELECT j.value FROM json_each(?) AS j WHERE NOT EXISTS (SELECT 1 FROM items WHERE fp=j.value)",
+                (json.dumps(fps),),
+            )
+        }
+        return [it for it, fp in zip(items, fps) if fp in missing]
+    existing = {r[0] for r in _select_in(conn, "SELECT fp FROM items WHERE fp IN ({})", fps)}
+    return [it for it, fp in zip(items, fps) if fp not in existing]
+
+
+def _insert_rows(items: list[Item], now: str) -> Iterator[tuple]:
+    """
+    Parameter tuples for the INSERT column list shared by upsert_seen/upsert_new.
+    A generator: executemany pulls one row at a time, so a batch's serialized raw_json strings
+    never all exist at once.
+    """
+    return (
+        (
+            it.identity_fp(),
+            it.course_id,
+            it.course_name,
+            it.source,
+            it.external_id or "",
+            it.state_fp(),
+            it.title,
+            it.url,
+            it.due or "",
+            it.ts or "",
+            _dump_raw(it.raw or {}),
+            now,
+            now,
+        )
+        for it in items
+    )
 
 
-def upsert_seen(db_path: Path, items: list[Item]) -> int:
+def upsert_seen(conn: sqlite3.Connection, items: list[Item]) -> int:
     """
     Insert items into DB (idempotent). Returns number of new rows inserted.
+    Usually `conn` comes from `connect()` and the write joins that batch; on a bare connection
+    it runs in its own BEGIN IMMEDIATE transaction.
     """
     if not items:
         return 0
-    now = _now_iso()
-    rows = []
-    for it in items:
-        fp = it.identity_fp()
-        raw_json = json.dumps(it.raw or {}, ensure_ascii=False, sort_keys=True)
-        state_fp = it.state_fp()
-        rows.append(
-            (
-                fp,
-                it.course_id,
-                it.course_name,
-                it.source,
-                it.external_id or "",
-                state_fp,
-                it.title,
-                it.url,
-                it.due or "",
-                it.ts or "",
-                raw_json,
-                now,
-                now,
-            )
-        )
+    rows = _insert_rows(items, _now_iso())
 
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
+    with _transaction(conn):
         cur = conn.executemany(
             """
             INSERT INTO items (
@@ -143,11 +308,65 @@ def upsert_seen(db_path: Path, items: list[Item]) -> int:
               ts=excluded.ts,
               raw_json=excluded.raw_json,
               updated_at=excluded.updated_at
+            -- Re-seeing an unchanged item leaves its row (and the WAL) untouched.
+            WHERE items.state_fp IS NOT excluded.state_fp OR items.raw_json IS NOT excluded.raw_json
+            """,
+            rows,
+        )
+    return cur.rowcount or 0
+
+
+def upsert_new(conn: sqlite3.Connection, items: list[Item]) -> int:
+    """
+    Insert items not yet in the DB (`new` from classification). Returns number of rows inserted.
+    Plain INSERT OR IGNORE: no conflict-update branch, rows that turn out to exist are left alone.
+    """
+    if not items:
+        return 0
+    rows = _insert_rows(items, _now_iso())
+    with _transaction(conn):
+        cur = conn.executemany(
+            """
+            INSERT OR IGNORE INTO items (
+              fp, course_id, course_name, source, external_id, state_fp,
+              title, url, due, ts, raw_json, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             rows,
         )
-        conn.commit()
-        return cur.rowcount or 0
+    return cur.rowcount or 0
+
+
+def upsert_updated(conn: sqlite3.Connection, items: list[Item]) -> int:
+    """
+    Write the latest state of items already in the DB. Rows whose state_fp and raw_json already
+    match are skipped, so callers may pass items whose raw may have changed without their state
+    (e.g. submission_url). Identity columns are left as they are. Returns number of rows updated.
+    """
+    if not items:
+        return 0
+    now = _now_iso()
+    rows = (
+        (
+            it.course_name,
+            it.state_fp(),
+            it.title,
+            it.url,
+            it.due or "",
+            it.ts or "",
+            _dump_raw(it.raw or {}),
+            now,
+            it.identity_fp(),
+        )
+        for it in items
+    )
+    with _transaction(conn):
+        cur = conn.executemany(
+            "UPDATE items SET course_name=?1, state_fp=?2, title=?3, url=?4, due=?5, ts=?6, raw_json=?7, updated_at=?8 "
+            "WHERE fp=?9 AND (state_fp IS NOT ?2 OR raw_json IS NOT ?7)",
+            rows,
+        )
+    return cur.rowcount or 0
 
 
 def bulk_classify(db_path: Path, items: list[Item]) -> tuple[list[Item], list[Item], list[Item]]:
@@ -161,105 +380,153 @@ def bulk_classify(db_path: Path, items: list[Item]) -> tuple[list[Item], list[It
         return ([], [], [])
 
     by_fp = {it.identity_fp(): it for it in items}
-    fps = list(by_fp.keys())
+    buckets: tuple[list[Item], list[Item], list[Item]] = ([], [], [])
+    new_items, updated_items, unchanged_items = buckets
+
+    conn = _get_conn(db_path)
+    if _HAS_JSON_EACH:
+        # Classify in SQL: one row per candidate, tagged 0=new/1=updated/2=unchanged and keyed by its
+        # position in the payload (placed back by key; an ORDER BY would need a temp B-tree).
+        its = list(by_fp.values())
+        rows = conn.execute(
+            "SELECT j.key, CASE WHEN i.fp IS NULL THEN 0 "
+            "WHEN COALESCE(i.state_fp,'')<>json_extract(j.value,'$[1]') THEN 1 ELSE 2 END "
+            "FROM json_each(?) AS j LEFT JOIN items AS i ON i.fp=json_extract(j.value,'$[0]')",
+            (json.dumps([[fp, it.state_fp()] for fp, it in by_fp.items()]),),
+        )
+        kinds = [0] * len(its)
+        for key, kind in rows:
+            kinds[key] = kind
+        for it, kind in zip(its, kinds):
+            buckets[kind].append(it)
+        return (new_items, updated_items, unchanged_items)
 
     existing_state: dict[str, str] = {}
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
-        chunk_size = 900
-        for i in range(0, len(fps), chunk_size):
-            chunk = fps[i : i + chunk_size]
-            q = ",".join("?" for _ in chunk)
-            rows = conn.execute(f"SELECT fp, COALESCE(state_fp,'') FROM items WHERE fp IN ({q})", chunk).fetchall()
-            for fp, state_fp in rows:
-                existing_state[str(fp)] = str(state_fp or "")
-
-    new_items: list[Item] = []
-    updated_items: list[Item] = []
-    unchanged_items: list[Item] = []
+    for fp, state_fp in _select_in(conn, "SELECT fp, COALESCE(state_fp,'') FROM items WHERE fp IN ({})", list(by_fp)):
+        existing_state[str(fp)] = str(state_fp or "")
+
     for fp, it in by_fp.items():
-        if fp not in existing_state:
+        stored = existing_state.get(fp)
+        if stored is None:
             new_items.append(it)
-            continue
-        if existing_state.get(fp, "") != it.state_fp():
+        elif stored != it.state_fp():
             updated_items.append(it)
         else:
             unchanged_items.append(it)
     return (new_items, updated_items, unchanged_items)
 
 
-def mark_sent(db_path: Path, fps: list[str]) -> int:
+def mark_sent(conn: sqlite3.Connection, fps: list[str]) -> int:
     if not fps:
         return 0
     now = _now_iso()
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
-        cur = conn.executemany("UPDATE items SET sent_at=? WHERE fp=? AND (sent_at IS NULL OR sent_at='')", [(now, fp) for fp in fps])
-        conn.commit()
-        return cur.rowcount or 0
+    with _transaction(conn):
+        if _HAS_JSON_EACH:
+            cur = conn.execute(
+                "UPDATE items SET sent_at=? WHERE fp IN (SELECT value FROM json_each(?)) AND (sent_at IS NULL OR sent_at='')",
+                (now, json.dumps(fps)),
+            )
+        else:
+            cur = conn.executemany(
+                "UPDATE items SET sent_at=? WHERE fp=? AND (sent_at IS NULL OR sent_at='')", [(now, fp) for fp in fps]
+            )
+    return cur.rowcount or 0
 
 
-def fetch_records(db_path: Path, fps: list[str]) -> dict[str, dict]:
+@dataclass
+class Record:
+    """
+    Stored state of one item, as read by fetch_records().
+    `raw` is decoded from raw_json on first access only; most records are never asked for it.
+    """
+
+    state_fp: str = ""
+    sent_state_fp: str = ""
+    sent_at: str = ""
+    raw_json: str = ""
+
+    @cached_property
+    def raw(self) -> dict:
+        try:
+            return _load_raw(self.raw_json) if self.raw_json else {}
+        except Exception:
+            return {}
+
+
+def fetch_state(db_path: Path, fps: list[str]) -> dict[str, Record]:
+    """
+    Like fetch_records, but only state_fp/sent_state_fp (sent_at and raw are left empty).
+    The covering idx_items_state can answer it without reading table rows (and their raw_json).
+    """
+    if not fps:
+        return {}
+    conn = _get_conn(db_path)
+    rows = _select_in(conn, "SELECT fp, state_fp, sent_state_fp FROM items WHERE fp IN ({})", fps)
+    return {fp: Record(state_fp or "", sent_state_fp or "") for fp, state_fp, sent_state_fp in rows}
+
+
+def fetch_records(db_path: Path, fps: list[str]) -> dict[str, Record]:
     """
     Fetch existing DB records for the given identity fps.
     """
     if not fps:
         return {}
-    out: dict[str, dict] = {}
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
-        chunk_size = 900
-        for i in range(0, len(fps), chunk_size):
-            chunk = fps[i : i + chunk_size]
-            q = ",".join("?" for _ in chunk)
-            rows = conn.execute(
-                f"SELECT fp, COALESCE(state_fp,''), COALESCE(sent_state_fp,''), COALESCE(raw_json,''), COALESCE(sent_at,'') "
-                f"FROM items WHERE fp IN ({q})",
-                chunk,
-            ).fetchall()
-            for fp, state_fp, sent_state_fp, raw_json, sent_at in rows:
-                try:
-                    raw = json.loads(raw_json) if raw_json else {}
-                except Exception:
-                    raw = {}
-                out[str(fp)] = {
-                    "state_fp": str(state_fp or ""),
-                    "sent_state_fp": str(sent_state_fp or ""),
-                    "raw": raw,
-                    "sent_at": str(sent_at or ""),
-                }
-    return out
-
-
-def mark_notified(db_path: Path, pairs: list[tuple[str, str]]) -> int:
+    conn = _get_conn(db_path)
+    rows = _select_in(conn, "SELECT fp, state_fp, sent_state_fp, sent_at, raw_json FROM items WHERE fp IN ({})", fps)
+    return {
+        fp: Record(state_fp or "", sent_state_fp or "", sent_at or "", raw_json or "")
+        for fp, state_fp, sent_state_fp, sent_at, raw_json in rows
+    }
+
+
+def _pairs_json(pairs: list[tuple[str, str]]) -> str:
+    """
+    (fp, state_fp) pairs as one JSON array of [fp, state_fp] for `UPDATE ... FROM json_each(?)`.
+    Deduplicated by fp, last pair winning, like the per-row executemany it replaces (UPDATE ... FROM
+    would apply an arbitrary one of several matches).
+    """
+    return json.dumps(list(dict(pairs).items()))
+
+
+def mark_notified(conn: sqlite3.Connection, pairs: list[tuple[str, str]]) -> int:
     """
     Mark (fp, state_fp) as notified; sets sent_at and sent_state_fp.
     """
     if not pairs:
         return 0
     now = _now_iso()
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
-        cur = conn.executemany(
-            "UPDATE items SET sent_at=?, sent_state_fp=? WHERE fp=?",
-            [(now, state_fp, fp) for fp, state_fp in pairs],
-        )
-        conn.commit()
-        return cur.rowcount or 0
+    with _transaction(conn):
+        if _HAS_JSON_EACH and _HAS_UPDATE_FROM:
+            cur = conn.execute(
+                "UPDATE items SET sent_at=?, sent_state_fp=json_extract(j.value,'$[1]') "
+                "FROM json_each(?) AS j WHERE items.fp=json_extract(j.value,'$[0]')",
+                (now, _pairs_json(pairs)),
+            )
+        else:
+            cur = conn.executemany(
+                "UPDATE items SET sent_at=?, sent_state_fp=? WHERE fp=?",
+                [(now, state_fp, fp) for fp, state_fp in pairs],
+            )
+    return cur.rowcount or 0
 
 
-def ack_state(db_path: Path, pairs: list[tuple[str, str]]) -> int:
+def ack_state(conn: sqlite3.Connection, pairs: list[tuple[str, str]]) -> int:
     """
     Acknowledge (fp, state_fp) without pushing (no sent_at update).
     Useful when we intentionally ignore updates for certain sources.
     """
     if not pairs:
         return 0
-    with sqlite3.connect(db_path) as conn:
-        _migrate_items_table(conn)
-        cur = conn.executemany(
-            "UPDATE items SET sent_state_fp=? WHERE fp=?",
-            [(state_fp, fp) for fp, state_fp in pairs],
-        )
-        conn.commit()
-        return cur.rowcount or 0
+    with _transaction(conn):
+        if _HAS_JSON_EACH and _HAS_UPDATE_FROM:
+            cur = conn.execute(
+                "UPDATE items SET sent_state_fp=json_extract(j.value,'$[1]') "
+                "FROM json_each(?) AS j WHERE items.fp=json_extract(j.value,'$[0]')",
+                (_pairs_json(pairs),),
+            )
+        else:
+            cur = conn.executemany(
+                "UPDATE items SET sent_state_fp=? WHERE fp=?",
+                [(state_fp, fp) for fp, state_fp in pairs],
+            )
+    return cur.rowcount or 0
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import app.bb
+import app.notify
+import app.store
+from app.bb.fetch_all import FetchAllResult
+from app.bb.login import LoginCheckResult
+from app.config import Config
+from app.main import _build_parser, _run_once
+from app.models import Item
+
+
+def _assignment(title: str, *, submitted: bool) -> Item:
+    # Same content id => same identity fp; the two boards disagree on state.
+    return Item(
+        "assignment",
+        "_1_1",
+        "C1",
+        title,
+        "http://bb/a/1",
+        external_id="_42_1",
+        raw={"is_online_submission": True, "submitted": submitted},
+    )
+
+
+class RunOnceDuplicateFpTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        # Cleanups run LIFO: register this before close_all so the DB is closed before its dir is removed.
+        self.addCleanup(tmpdir.cleanup)
+        tmp = Path(tmpdir.name)
+        self.config = Config(
+            bb_base_url="http://bb",
+            bb_login_url="",
+            bb_courses_url="http://bb/portal",
+            bb_state_path=tmp / "storage_state.json",
+            bb_username="",
+            bb_password="",
+            db_path=tmp / "state.db",
+            bark_endpoint="token",
+            poll_limit_per_run=100,
+            headless=True,
+            log_path=tmp / "run.log",
+        )
+        self.root = tmp
+        self.items: list[Item] = []
+        self.addCleanup(app.store.close_all)
+
+        async def fake_login(**kwargs):
+            return LoginCheckResult(ok=True, final_url="http://bb/portal", title="", note="")
+
+        async def fake_fetch(**kwargs):
+            return FetchAllResult(courses=[], items=list(self.items), errors=[])
+
+        for patcher in (
+            mock.patch.object(app.bb, "ensure_login", fake_login),
+            mock.patch.object(app.bb, "fetch_all_items", fake_fetch),
+            mock.patch.object(app.notify, "send_bark", lambda **kwargs: None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _run(self) -> int:
+        return _run_once(_build_parser().parse_args(["--run"]), self.config, self.root)
+
+    def test_duplicate_fp_keeps_last_and_stops_rewriting(self) -> None:
+        first = _assignment("hw1 (教学内容)", submitted=False)
+        last = _assignment("hw1", submitted=True)
+        self.assertEqual(first.identity_fp(), last.identity_fp())
+
+        # Bootstrap with an unrelated item so later runs take the normal path.
+        self.items = [Item("announcement", "_1_1", "C1", "hello", "http://bb/n/1", external_id="_7_1")]
+        self.assertEqual(self._run(), 0)
+
+        self.items = [first, last]
+        self.assertEqual(self._run(), 0)
+        rec = app.store.fetch_records(self.config.db_path, [last.identity_fp()])[last.identity_fp()]
+        self.assertEqual(rec.state_fp, last.state_fp())
+        self.assertEqual(rec.sent_state_fp, last.state_fp())
+
+        # Same batch again: nothing changed, so no row may be rewritten.
+        written: list[int] = []
+        real_upsert_updated = app.store.upsert_updated
+
+        def upsert_updated(conn, items):
+            written.append(real_upsert_updated(conn, items))
+            return written[-1]
+
+        with mock.patch.object(app.store, "upsert_updated", upsert_updated):
+            for _ in range(3):
+                self.assertEqual(self._run(), 0)
+        self.assertEqual(written, [0, 0, 0])
+
+    def test_raw_only_change_is_stored(self) -> None:
+        item = _assignment("hw1", submitted=True)
+        item.raw["submission_url"] = "http://bb/s/1"
+        self.items = [item]
+        self.assertEqual(self._run(), 0)
+
+        # submission_url is not part of state_fp, but the next update message reads it from the stored raw.
+        item = _assignment("hw1", submitted=True)
+        item.raw["submission_url"] = "http://bb/s/2"
+        self.items = [item]
+        self.assertEqual(self._run(), 0)
+        rec = app.store.fetch_records(self.config.db_path, [item.identity_fp()])[item.identity_fp()]
+        self.assertEqual(rec.raw["submission_url"], "http://bb/s/2")
+
+
+if __name__ == "__main__":
+    unittest.main()